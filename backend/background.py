@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SideEffectQueue:
+    """In-process queue that runs deferred write side effects with bounded concurrency.
+
+    A job is a sequence of steps, each a zero-argument callable returning an awaitable.
+    Steps run in order and a failing step is retried on its own, so earlier steps are not
+    run again. A step can fail after its write landed, though, so delivery is at least once:
+    steps must be idempotent.
+    """
+
+    def __init__(self, concurrency=4, max_retries=3, retry_delay=0.5):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue = None
+        self.workers = []
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        if self.workers:
+            return
+        self.queue = asyncio.Queue()
+        self.workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    def submit(self, name, *steps):
+        self.start()
+        self.queue.put_nowait((name, steps, time.monotonic()))
+
+    async def flush(self):
+        """Wait until every job submitted so far has finished."""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def stop(self):
+        await self.flush()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queue = None
+
+    async def _work(self):
+        while True:
+            name, steps, enqueued_at = await self.queue.get()
+            self.in_flight += 1
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+            try:
+                for step in steps:
+                    await self._run_step(name, step)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Side effect job %s failed after %d retries", name, self.max_retries)
+            finally:
+                self.in_flight -= 1
+                self.queue.task_done()
+
+    async def _run_step(self, name, step):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await step()
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                self.retried += 1
+                logger.warning("Retrying side effect job %s (attempt %d)", name, attempt + 2)
+                await asyncio.sleep(self.retry_delay * (attempt + 1))
+
+    def stats(self):
+        return {
+            "depth": (self.queue.qsize() if self.queue is not None else 0) + self.in_flight,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "last_lag_seconds": round(self.last_lag, 4),
+            "max_lag_seconds": round(self.max_lag, 4),
+            "concurrency": self.concurrency,
+        }
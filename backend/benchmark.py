@@ -0,0 +1,303 @@
+"""In-process latency benchmark for the API routes.
+
+Drives the FastAPI app through an ASGI transport (no network, no server process),
+seeds a realistic history, then measures throughput and p50/p95/p99 latency per route
+at the requested concurrency. Results are written as JSON and can be compared with a
+previous run:
+
+    python benchmark.py --days 365 --concurrency 8 --output bench.json
+    python benchmark.py --baseline bench.json --max-regression 0.2
+
+All requests are made as a throwaway `bench-<uuid>` user whose data is deleted afterwards,
+so running against a real Mongo database leaves existing users untouched.
+
+Pass --slow-json to measure list routes through response_model validation instead of orjson,
+or --slow-json get_tasks get_achievements to do so for those routes only.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+SUBJECTS = ["Matematik", "Fizik", "Kimya", "Biyoloji", "Türkçe", "Tarih"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark API routes in process")
+    parser.add_argument("--storage", choices=["memory", "mongo"], default="memory",
+                        help="Storage backend (mongo uses MONGO_URL/DB_NAME)")
+    parser.add_argument("--days", type=int, default=180, help="Days of history to seed")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per route")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per route")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients per route")
+    parser.add_argument("--routes", nargs="*", help="Only run these routes")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the read response cache")
+    parser.add_argument("--slow-json", nargs="*", metavar="ROUTE",
+                        help="Serve these list routes (all without names) through response_model validation "
+                             "instead of orjson")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write results")
+    parser.add_argument("--baseline", help="Previous results file to compare p95 latency against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed relative p95 increase over the baseline")
+    return parser.parse_args()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def seed_history(client, days, rng):
+    """Write `days` of tasks, pomodoros and study stats through the batch endpoints."""
+    today = date.today()
+    sessions, stats, tasks = [], [], []
+    for offset in range(days):
+        day = (today - timedelta(days=offset)).isoformat()
+        # Most days have some study, a few are skipped entirely
+        if rng.random() < 0.15:
+            continue
+        for _ in range(rng.randint(2, 8)):
+            sessions.append({"duration_minutes": 25, "session_type": "work",
+                             "subject": rng.choice(SUBJECTS), "date": day})
+            sessions.append({"duration_minutes": 5, "session_type": "break", "date": day})
+        for subject in rng.sample(SUBJECTS, rng.randint(1, 3)):
+            solved = rng.randint(10, 60)
+            stats.append({"subject": subject, "questions_solved": solved,
+                          "correct_answers": rng.randint(solved // 2, solved),
+                          "time_spent_minutes": rng.randint(20, 120), "date": day})
+        for index in range(rng.randint(1, 5)):
+            tasks.append({"title": f"Görev {index + 1}", "subject": rng.choice(SUBJECTS), "date": day,
+                          "priority": rng.choice(["low", "medium", "high"])})
+
+    for path, items in (("pomodoro/batch", sessions), ("study-stats/batch", stats), ("tasks/batch", tasks)):
+        for start in range(0, len(items), 1000):
+            response = await client.post(f"/api/{path}", json=items[start:start + 1000])
+            response.raise_for_status()
+    await client.post("/api/admin/side-effects/flush")
+    return {"pomodoro_sessions": len(sessions), "study_stats": len(stats), "tasks": len(tasks)}
+
+
+async def delete_user_data(server, user_id):
+    for collection in server.USER_COLLECTIONS:
+        await server.db[collection].delete_many({"user_id": user_id})
+    await server.db.user_profile.delete_many({"id": user_id})
+    await server.db.data_versions.delete_many({"_id": user_id})
+
+
+def build_scenarios(rng, task_ids):
+    """Each scenario issues one request and returns the response."""
+    today = date.today().isoformat()
+
+    def new_task():
+        return {"title": "Bench", "subject": rng.choice(SUBJECTS), "date": today}
+
+    async def tasks_create(client):
+        return await client.post("/api/tasks", json=new_task())
+
+    async def tasks_list(client):
+        return await client.get("/api/tasks", params={"date": today})
+
+    async def tasks_page(client):
+        return await client.get("/api/tasks", params={"limit": 1000})
+
+    async def study_stats_page(client):
+        return await client.get("/api/study-stats", params={"limit": 1000})
+
+    async def tasks_update(client):
+        return await client.put(f"/api/tasks/{rng.choice(task_ids)}", json={"completed": rng.random() < 0.5})
+
+    async def tasks_delete(client):
+        created = await client.post("/api/tasks", json=new_task())
+        return await client.delete(f"/api/tasks/{created.json()['id']}")
+
+    async def pomodoro_write(client):
+        return await client.post("/api/pomodoro", json={
+            "duration_minutes": 25, "session_type": "work", "subject": rng.choice(SUBJECTS), "date": today
+        })
+
+    async def study_stats_summary(client):
+        return await client.get("/api/study-stats/summary")
+
+    async def heatmap(client):
+        return await client.get("/api/heatmap", params={"days": 365})
+
+    async def dashboard(client):
+        return await client.get("/api/dashboard/stats")
+
+    async def weekly_report(client):
+        return await client.get("/api/reports/weekly")
+
+    async def monthly_report(client):
+        start = (date.today() - timedelta(days=364)).isoformat()
+        return await client.get("/api/reports", params={"from": start, "to": today, "granularity": "month"})
+
+    etags = {}
+
+    async def dashboard_revalidate(client):
+        # A client polling with If-None-Match; 304s until a write scenario bumps a version
+        response = await client.get("/api/dashboard/stats", headers={"If-None-Match": etags.get("dashboard", "")})
+        etags["dashboard"] = response.headers.get("etag", "")
+        return response
+
+    return {
+        "tasks_create": tasks_create,
+        "tasks_list": tasks_list,
+        "tasks_page": tasks_page,
+        "study_stats_page": study_stats_page,
+        "tasks_update": tasks_update,
+        "tasks_delete": tasks_delete,
+        "pomodoro_write": pomodoro_write,
+        "study_stats_summary": study_stats_summary,
+        "heatmap": heatmap,
+        "dashboard": dashboard,
+        "dashboard_revalidate": dashboard_revalidate,
+        "weekly_report": weekly_report,
+        "monthly_report": monthly_report,
+    }
+
+
+async def run_scenario(client, scenario, total, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await scenario(client)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": to_ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "max_ms": to_ms(latencies[-1]) if latencies else 0.0,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Return the routes whose p95 grew by more than max_regression over the baseline."""
+    regressions = []
+    for name, current in results["routes"].items():
+        previous = baseline.get("routes", {}).get(name)
+        if not previous or not previous["p95_ms"]:
+            continue
+        change = current["p95_ms"] / previous["p95_ms"] - 1
+        current["p95_change"] = round(change, 3)
+        if change > max_regression:
+            regressions.append((name, previous["p95_ms"], current["p95_ms"], change))
+    return regressions
+
+
+async def main(args):
+    import httpx
+    import server
+
+    # Per-request access logs would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.slow_json is not None:
+        unknown = set(args.slow_json) - set(server.FAST_JSON_ROUTES)
+        if unknown:
+            raise SystemExit(f"Not a fast JSON route: {', '.join(sorted(unknown))} "
+                             f"(choose from {', '.join(sorted(server.FAST_JSON_ROUTES))})")
+        server.FAST_JSON_ROUTES.update(dict.fromkeys(args.slow_json or server.FAST_JSON_ROUTES, False))
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=server.app)
+    await server.ensure_indexes()
+    server.side_effects.start()
+    user_id = f"bench-{uuid.uuid4().hex}"
+
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark",
+                                     headers={"X-User-Id": user_id}) as client:
+            seeded = await seed_history(client, args.days, rng)
+            task_ids = [task["id"] for task in (await client.get("/api/tasks", params={"limit": 500})).json()]
+
+            scenarios = build_scenarios(rng, task_ids)
+            if args.routes:
+                unknown = set(args.routes) - set(scenarios)
+                if unknown:
+                    raise SystemExit(f"Unknown routes: {', '.join(sorted(unknown))}")
+                scenarios = {name: scenarios[name] for name in args.routes}
+
+            routes = {}
+            for name, scenario in scenarios.items():
+                if args.warmup:
+                    await run_scenario(client, scenario, args.warmup, args.concurrency)
+                routes[name] = await run_scenario(client, scenario, args.requests, args.concurrency)
+                # Keep deferred work from one route out of the next route's numbers
+                await server.side_effects.flush()
+    finally:
+        await server.side_effects.stop()
+        await delete_user_data(server, user_id)
+        server.client.close()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "storage": args.storage,
+            "days": args.days,
+            "seeded": seeded,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": not args.no_cache,
+            "fast_json": dict(server.FAST_JSON_ROUTES),
+            "python": platform.python_version(),
+        },
+        "routes": routes,
+    }
+
+
+def report(results):
+    print(f"{'route':<22}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, stats in results["routes"].items():
+        print(f"{name:<22}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['errors']:>8}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # The app reads its configuration at import time
+    os.environ["STORAGE_BACKEND"] = args.storage
+    if args.no_cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+
+    results = asyncio.run(main(args))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    report(results)
+    print(f"\nResults written to {args.output}")
+    for name, before, after, change in regressions:
+        print(f"REGRESSION {name}: p95 {before} ms -> {after} ms (+{change:.0%})")
+    sys.exit(1 if regressions else 0)
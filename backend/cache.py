@@ -0,0 +1,58 @@
+from collections import OrderedDict
+import time
+
+
+class ResponseCache:
+    """In-process LRU cache with a TTL.
+
+    Callers put the data versions an entry was computed from into its key, so a write from any
+    process makes the next lookup miss; invalidate only evicts entries that can no longer be hit.
+    """
+
+    def __init__(self, maxsize=512, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, depends_on, user_id, value)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[3]
+
+    def set(self, key, value, depends_on, user_id=None):
+        self.entries[key] = (time.monotonic() + self.ttl, frozenset(depends_on), user_id, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, *collections, user_id=None):
+        """Evict the user's entries that read any of the collections; every user's with user_id None."""
+        stale = [
+            key for key, entry in self.entries.items()
+            if entry[1].intersection(collections) and (user_id is None or entry[2] == user_id)
+        ]
+        for key in stale:
+            del self.entries[key]
+        self.invalidations += len(stale)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+        }
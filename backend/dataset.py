@@ -0,0 +1,247 @@
+"""Synthetic history generator and scaling benchmark.
+
+Generates tasks, pomodoro_sessions, study_stats, focus_trees and achievements in
+exactly the shape the routes write them (native datetime timestamps included),
+bulk-loads them, and rebuilds the derived state (daily totals, streak, profile).
+
+    python dataset.py --storage mongo generate --days 1095 --subjects Matematik:3,Fizik:2,Kimya:1 --wipe
+    python dataset.py --users 20 scale --volumes 30,365,1095,2190 --requests 50
+
+``scale`` reloads the dataset at each volume and reports how route latency grows. With
+--users N (an option of the script, so it goes before the subcommand), N-1 other users get
+histories of the same length and subject mix, each drawn separately; the measured user is the
+default one, so latency should follow that user's data, not the total.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+from datetime import date, datetime, time, timedelta, timezone
+
+COLLECTIONS = ("tasks", "pomodoro_sessions", "study_stats", "focus_trees", "achievements",
+               "daily_totals", "subject_totals", "user_profile")
+DEFAULT_SUBJECTS = "Matematik:3,Fizik:2,Kimya:2,Biyoloji:1,Türkçe:2,Tarih:1"
+SCALE_ROUTES = ["tasks_list", "pomodoro_write", "study_stats_summary", "heatmap", "dashboard", "weekly_report",
+                "monthly_report"]
+
+
+def parse_subjects(spec):
+    """Parse "Name:weight,Name:weight" into ([names], [weights])."""
+    names, weights = [], []
+    for part in spec.split(","):
+        name, _, weight = part.partition(":")
+        names.append(name.strip())
+        weights.append(float(weight or 1))
+    return names, weights
+
+
+def generate(server, days, subjects, weights, rng, end_date=None, intensity=1.0, user_id=None):
+    """Build `days` days of one user's history ending at end_date, keyed by collection."""
+    user_id = user_id or server.DEFAULT_USER_ID
+    end_date = end_date or date.today()
+    docs = {"tasks": [], "pomodoro_sessions": [], "study_stats": [], "focus_trees": []}
+
+    for offset in range(days):
+        day = end_date - timedelta(days=offset)
+        weekend = day.weekday() >= 5
+        # Weekends are skipped more often and are lighter
+        if rng.random() < (0.3 if weekend else 0.1):
+            continue
+
+        clock = datetime.combine(day, time(rng.randint(8, 18), rng.choice([0, 15, 30, 45])), timezone.utc)
+        work_sessions = max(1, round(rng.gauss(4 if weekend else 6, 2) * intensity))
+        studied = {}
+        for index in range(work_sessions):
+            subject = rng.choices(subjects, weights)[0]
+            minutes = rng.choice([25, 25, 25, 50])
+            studied[subject] = studied.get(subject, 0) + minutes
+            docs["pomodoro_sessions"].append(server.PomodoroSession(
+                duration_minutes=minutes, session_type="work", subject=subject, date=day.isoformat(),
+                mood_after=rng.choice(["happy", "neutral", "tired", None]), timestamp=clock
+            ).model_dump())
+            clock += timedelta(minutes=minutes)
+
+            if rng.random() < 0.5:
+                docs["focus_trees"].append(server.FocusTree(
+                    tree_type="seedling" if minutes < 50 else "young", duration_minutes=minutes,
+                    subject=subject, survived=rng.random() < 0.85, date=day.isoformat(), timestamp=clock
+                ).model_dump())
+
+            break_minutes = 15 if index % 4 == 3 else 5
+            docs["pomodoro_sessions"].append(server.PomodoroSession(
+                duration_minutes=break_minutes, session_type="break", date=day.isoformat(), timestamp=clock
+            ).model_dump())
+            clock += timedelta(minutes=break_minutes)
+
+        for subject, minutes in studied.items():
+            solved = max(1, round(minutes / 2 * rng.uniform(0.5, 1.5)))
+            docs["study_stats"].append(server.StudyStats(
+                subject=subject, questions_solved=solved,
+                correct_answers=round(solved * rng.uniform(0.5, 0.95)),
+                time_spent_minutes=minutes, date=day.isoformat(), timestamp=clock
+            ).model_dump())
+
+        for index in range(rng.randint(1, 5)):
+            subtasks = [{"title": f"Adım {step + 1}", "completed": rng.random() < 0.7}
+                        for step in range(rng.choice([0, 0, 2, 3]))]
+            task = server.Task(
+                title=f"Görev {index + 1}", subject=rng.choices(subjects, weights)[0],
+                priority=rng.choice(["low", "medium", "high"]), date=day.isoformat(),
+                duration_minutes=rng.choice([25, 50, 75]), subtasks=subtasks,
+                completed=rng.random() < (0.3 if offset == 0 else 0.8),
+                created_at=datetime.combine(day, time(7), timezone.utc)
+            )
+            docs["tasks"].append(task.model_dump())
+
+    for items in docs.values():
+        for doc in items:
+            doc["user_id"] = user_id
+    return docs
+
+
+async def wipe(db):
+    for name in (*COLLECTIONS, "data_versions"):
+        await db[name].delete_many({})
+
+
+def user_ids(server, count):
+    return [server.DEFAULT_USER_ID] + [f"user-{index}" for index in range(1, count)]
+
+
+async def load(server, docs, user_id=None, chunk_size=5000):
+    """Bulk-insert one user's generated documents and rebuild everything derived from them."""
+    user_id = user_id or server.DEFAULT_USER_ID
+    db = server.db
+    for name, items in docs.items():
+        for start in range(0, len(items), chunk_size):
+            await db[name].insert_many(items[start:start + chunk_size])
+
+    work = [s for s in docs["pomodoro_sessions"] if s["session_type"] == "work"]
+    await db.user_profile.update_one({"id": user_id}, {"$inc": {
+        "total_focus_minutes": sum(s["duration_minutes"] for s in work),
+        "trees_planted": sum(1 for t in docs["focus_trees"] if t["survived"]),
+        "experience": 10 * len(work)
+        + 2 * sum(s["questions_solved"] for s in docs["study_stats"])
+        + 25 * sum(1 for t in docs["focus_trees"] if t["survived"]),
+    }}, upsert=True)
+
+    await server.rebuild_daily_totals(user_id)
+    await server.rebuild_subject_totals(user_id)
+    await server.recompute_streak(user_id)
+    # Earned badges are cached in-process; the wipe made that cache stale
+    server._earned_badges.pop(user_id, None)
+    awarded = await server.check_and_award_achievements(user_id)
+    await server.touch(user_id, *COLLECTIONS)
+
+    counts = {name: len(items) for name, items in docs.items()}
+    counts["achievements"] = len(awarded)
+    return counts
+
+
+async def run_generate(server, args):
+    subjects, weights = parse_subjects(args.subjects)
+    if args.wipe:
+        await wipe(server.db)
+    rng = random.Random(args.seed)
+    counts = {}
+    for user_id in user_ids(server, args.users):
+        docs = generate(server, args.days, subjects, weights, rng, intensity=args.intensity, user_id=user_id)
+        for name, count in (await load(server, docs, user_id)).items():
+            counts[name] = counts.get(name, 0) + count
+    print(json.dumps(counts, indent=2))
+
+
+async def run_scale(server, args):
+    import httpx
+    import benchmark
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    subjects, weights = parse_subjects(args.subjects)
+    volumes = [int(value) for value in args.volumes.split(",")]
+    results = {"meta": {"storage": args.storage, "requests": args.requests,
+                        "concurrency": args.concurrency, "subjects": args.subjects, "users": args.users},
+               "volumes": []}
+
+    await server.ensure_indexes()
+    server.side_effects.start()
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://scale") as client:
+        for days in volumes:
+            rng = random.Random(args.seed)
+            await wipe(server.db)
+            counts = {}
+            for user_id in user_ids(server, args.users):
+                docs = generate(server, days, subjects, weights, rng, intensity=args.intensity, user_id=user_id)
+                for name, count in (await load(server, docs, user_id)).items():
+                    counts[name] = counts.get(name, 0) + count
+            task_ids = [task["id"] for task in (await client.get("/api/tasks", params={"limit": 500})).json()]
+            scenarios = benchmark.build_scenarios(rng, task_ids)
+
+            routes = {}
+            for name in SCALE_ROUTES:
+                await benchmark.run_scenario(client, scenarios[name], args.warmup, args.concurrency)
+                routes[name] = await benchmark.run_scenario(client, scenarios[name], args.requests, args.concurrency)
+                await server.side_effects.flush()
+            results["volumes"].append({"days": days, "documents": counts, "routes": routes})
+            print(f"{days} days loaded ({sum(counts.values())} documents)", file=sys.stderr)
+
+    await server.side_effects.stop()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    print(f"{'route':<22}" + "".join(f"{str(v['days']) + 'd p95':>14}" for v in results["volumes"]))
+    for name in SCALE_ROUTES:
+        print(f"{name:<22}" + "".join(f"{v['routes'][name]['p95_ms']:>14}" for v in results["volumes"]))
+    print(f"\nResults written to {args.output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic history and measure scaling")
+    parser.add_argument("--storage", choices=["memory", "mongo"], default="memory",
+                        help="Storage backend (mongo uses MONGO_URL/DB_NAME)")
+    parser.add_argument("--subjects", default=DEFAULT_SUBJECTS, help='Subject mix as "Name:weight,..."')
+    parser.add_argument("--intensity", type=float, default=1.0, help="Scale factor for sessions per day")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--users", type=int, default=1, help="Users to generate history for")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Generate and bulk-load one dataset")
+    generate_parser.add_argument("--days", type=int, default=365, help="Days of history")
+    generate_parser.add_argument("--wipe", action="store_true", help="Delete existing data first")
+
+    scale_parser = subparsers.add_parser("scale", help="Measure route latency across dataset sizes")
+    scale_parser.add_argument("--volumes", default="30,365,1095", help="Comma-separated days of history")
+    scale_parser.add_argument("--requests", type=int, default=50, help="Measured requests per route")
+    scale_parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per route")
+    scale_parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients per route")
+    scale_parser.add_argument("--output", default="scaling_results.json", help="Where to write results")
+    scale_parser.add_argument("--wipe", action="store_true",
+                              help="Required with --storage mongo: every volume wipes the database")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == "generate" and args.storage == "memory":
+        raise SystemExit("generate only makes sense against --storage mongo")
+    if args.command == "scale" and args.storage == "mongo" and not args.wipe:
+        raise SystemExit("scale wipes the database for each volume; pass --wipe to confirm")
+
+    # The app reads its configuration at import time; scaling runs measure uncached reads
+    os.environ["STORAGE_BACKEND"] = args.storage
+    if args.command == "scale":
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    import server
+
+    try:
+        asyncio.run(run_scale(server, args) if args.command == "scale" else run_generate(server, args))
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    main()
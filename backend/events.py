@@ -0,0 +1,108 @@
+"""In-process fan-out of per-user change events to Server-Sent Events subscribers."""
+import asyncio
+import itertools
+import time
+
+import orjson
+
+
+class Subscription:
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+
+class EventBroker:
+    """Delivers events published for a user to every open subscription of that user.
+
+    Publishing never waits: a subscriber whose queue is full loses its backlog and gets a
+    single "resync" event instead, telling the client to refetch rather than replay.
+    Subscribers only see events from this process.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.subscribers = {}  # user_id -> set of Subscription
+        self.ids = itertools.count(1)
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        self.subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self.subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self.subscribers[subscription.user_id]
+
+    def listening(self, user_id):
+        return user_id in self.subscribers
+
+    def publish(self, user_id, event, data):
+        subscribers = self.subscribers.get(user_id)
+        if not subscribers:
+            return
+        self.published += 1
+        message = (next(self.ids), event, data)
+        for subscription in subscribers:
+            if subscription.dropped:
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._resync(subscription)
+
+    def _resync(self, subscription):
+        self.resyncs += 1
+        subscription.dropped = True
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait((next(self.ids), "resync", {}))
+
+    async def stream(self, subscription, heartbeat=15.0, max_seconds=300.0, retry_ms=3000):
+        """Yield SSE frames for a subscription until the client goes away or max_seconds pass.
+
+        Ending streams periodically lets the server shut down without waiting on idle
+        clients; EventSource reconnects on its own after retry_ms.
+        """
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield b"retry: %d\n" % retry_ms + format_event(next(self.ids), "ready", {})
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event_id, event, data = await asyncio.wait_for(
+                        subscription.queue.get(), min(heartbeat, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+                    continue
+                if event == "resync":
+                    subscription.dropped = False
+                yield format_event(event_id, event, data)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            "users": len(self.subscribers),
+            "subscriptions": sum(len(subscribers) for subscribers in self.subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "resyncs": self.resyncs,
+        }
+
+
+def format_event(event_id, event, data):
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event.encode(), orjson.dumps(data, option=orjson.OPT_UTC_Z))
@@ -0,0 +1,82 @@
+"""Maintenance commands for the backend database.
+
+Run from the backend directory, e.g. ``python manage.py repair-streaks``.
+"""
+import argparse
+import asyncio
+
+import server
+
+
+async def repair_streaks(args):
+    if args.user:
+        users = [args.user]
+    else:
+        users = sorted(set(await server.db.user_profile.distinct("id"))
+                       | set(await server.db.pomodoro_sessions.distinct("user_id")))
+    for user_id in users:
+        state = await server.recompute_streak(user_id)
+        print(
+            f"Streak rebuilt for {user_id}: current={state['current_streak']} "
+            f"longest={state['longest_streak']} last_active={state['last_active_date']}"
+        )
+
+
+async def backfill_daily_totals(args):
+    rows = await server.rebuild_daily_totals()
+    print(f"Daily totals rebuilt: {rows} user-days")
+
+
+async def backfill_subject_totals(args):
+    rows = await server.rebuild_subject_totals()
+    print(f"Subject totals rebuilt: {rows} user-subjects")
+
+
+async def migrate_timestamps(args):
+    migrated = await server.migrate_timestamps(args.batch_size)
+    for collection, count in migrated.items():
+        print(f"{collection}: {count} timestamps converted")
+
+
+async def migrate_user_ids(args):
+    migrated = await server.migrate_user_ids()
+    for collection, count in migrated.items():
+        print(f"{collection}: {count} documents assigned to {server.DEFAULT_USER_ID}")
+
+
+async def migrate_subtask_ids(args):
+    migrated = await server.migrate_subtask_ids(args.batch_size)
+    print(f"tasks: {migrated} documents had subtasks assigned ids")
+
+
+COMMANDS = {
+    "repair-streaks": (repair_streaks, "Rebuild profile streak fields from pomodoro history"),
+    "backfill-daily-totals": (backfill_daily_totals, "Rebuild the daily_totals rollup from raw collections"),
+    "backfill-subject-totals": (backfill_subject_totals, "Rebuild the subject_totals rollup from study_stats"),
+    "migrate-timestamps": (migrate_timestamps, "Convert isoformat string timestamps to native BSON dates"),
+    "migrate-user-ids": (migrate_user_ids, "Assign pre-multi-user documents to the default user"),
+    "migrate-subtask-ids": (migrate_subtask_ids, "Give legacy subtasks the ids the subtask routes address"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    subparsers.choices["repair-streaks"].add_argument("--user", help="Only this user id (default: all users)")
+    for name in ("migrate-timestamps", "migrate-subtask-ids"):
+        subparsers.choices[name].add_argument(
+            "--batch-size", type=int, default=1000, help="Documents rewritten per bulk write"
+        )
+
+    args = parser.parse_args()
+    handler, _ = COMMANDS[args.command]
+    try:
+        asyncio.run(handler(args))
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    main()
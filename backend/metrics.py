@@ -0,0 +1,213 @@
+"""Request and MongoDB command metrics in the Prometheus text exposition format."""
+from contextvars import ContextVar
+import threading
+import time
+
+from pymongo import monitoring
+
+# DB command count of the request being served; Motor copies the context into its executor
+current_request_usage = ContextVar("current_request_usage", default=None)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels=(), value=0):
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts, total, count = self.values.get(labels, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self.values[labels] = (counts, total + value, count + 1)
+
+    def render(self):
+        lines = self.header()
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class RequestUsage:
+    def __init__(self, scope=None):
+        self.db_commands = 0
+        self.scope = scope
+
+    def route(self):
+        """Method and route template of the request, once routing has matched it."""
+        if self.scope is None:
+            return None
+        route = self.scope.get("route")
+        return f'{self.scope["method"]} {route.path if route is not None else self.scope["path"]}'
+
+
+class AppMetrics:
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "HTTP requests served", ("method", "route", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+        self.response_size = Histogram("http_response_size_bytes", "HTTP response body size",
+                                       ("method", "route"), SIZE_BUCKETS)
+        self.in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+        self.request_db_commands = Histogram("http_request_db_commands", "MongoDB commands issued per request",
+                                             ("method", "route"), COUNT_BUCKETS)
+        self.db_commands = Counter("mongodb_commands_total", "MongoDB commands issued", ("collection", "command"))
+        self.db_failures = Counter("mongodb_command_failures_total", "MongoDB commands that failed",
+                                   ("collection", "command"))
+        self.db_latency = Histogram("mongodb_command_duration_seconds", "MongoDB command latency",
+                                    ("collection", "command"))
+        self.command_listener = CommandMetricsListener(self)
+        self.metrics = [self.requests, self.latency, self.response_size, self.in_flight,
+                        self.request_db_commands, self.db_commands, self.db_failures, self.db_latency]
+
+    def render(self, extra=()):
+        """Render all metrics; extra is a list of (name, kind, help, value) samples gathered at scrape time."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for name, kind, help_text, value in extra:
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Times MongoDB commands per collection and counts them against the current request."""
+
+    IGNORED = {"hello", "isMaster", "ismaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _collection(event):
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            return target
+        return event.command.get("collection", "-")
+
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        with self.lock:
+            self.pending[(event.connection_id, event.request_id)] = self._collection(event)
+        usage = current_request_usage.get()
+        if usage is not None:
+            usage.db_commands += 1
+
+    def _finish(self, event):
+        with self.lock:
+            collection = self.pending.pop((event.connection_id, event.request_id), None)
+        if collection is None:
+            return None
+        labels = (collection, event.command_name)
+        self.metrics.db_commands.inc(labels)
+        self.metrics.db_latency.observe(labels, event.duration_micros / 1_000_000)
+        return labels
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        labels = self._finish(event)
+        if labels is not None:
+            self.metrics.db_failures.inc(labels)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route counts, latency, response size and DB commands."""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        usage = RequestUsage(scope)
+        token = current_request_usage.set(usage)
+        self.metrics.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.in_flight.inc(amount=-1)
+            current_request_usage.reset(token)
+
+            # Label by route template so path parameters do not explode cardinality
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            self.metrics.requests.inc(labels + (str(status),))
+            self.metrics.latency.observe(labels, elapsed)
+            self.metrics.response_size.observe(labels, size)
+            self.metrics.request_db_commands.observe(labels, usage.db_commands)
@@ -0,0 +1,92 @@
+"""On-demand cProfile capture of single requests."""
+import asyncio
+import cProfile
+import hmac
+import re
+import time
+
+PROFILE_HEADER = b"x-profile"
+STREAMING_TYPES = (b"text/event-stream", b"application/x-ndjson")
+
+
+class ProfilerMiddleware:
+    """Profiles requests whose `X-Profile` header carries the token and writes one pstats file per request.
+
+    cProfile hooks the whole thread, so only one request is profiled at a time and other
+    requests interleaved on the event loop show up in the same profile. Time spent waiting
+    on MongoDB appears under the event loop's selector rather than under the route.
+    Streamed responses (SSE, NDJSON, anything sent in several parts) are passed through
+    unprofiled as soon as they start.
+    """
+
+    def __init__(self, app, directory, token):
+        if not token:
+            raise ValueError("ProfilerMiddleware needs a token")
+        self.app = app
+        self.directory = directory
+        self.token = token.encode()
+        self.busy = False
+
+    def _requested(self, scope):
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.busy or not self._requested(scope):
+            return await self.app(scope, receive, send)
+
+        # Hold the response back until the profile is written so its file name can go in a header
+        held = []
+        streaming = False
+
+        async def hold(message):
+            nonlocal streaming
+            if not streaming and _streams(message):
+                # A stream can stay open for minutes; holding it would stall the client, grow
+                # without bound and keep every other request from being profiled
+                streaming = True
+                profiler.disable()
+                self.busy = False
+                for earlier in held:
+                    await send(earlier)
+                held.clear()
+            if streaming:
+                await send(message)
+            else:
+                held.append(message)
+
+        self.busy = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, hold)
+        finally:
+            if not streaming:
+                profiler.disable()
+                self.busy = False
+        if streaming:
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        route = scope.get("route")
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", route.path if route is not None else scope["path"]).strip("-")
+        filename = f"{time.strftime('%Y%m%dT%H%M%S')}_{scope['method']}_{slug or 'root'}_{elapsed_ms:.0f}ms.prof"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(profiler.dump_stats, self.directory / filename)
+
+        for message in held:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-file", filename.encode())]}
+            await send(message)
+
+
+def _streams(message):
+    if message["type"] == "http.response.body":
+        return message.get("more_body", False)
+    for name, value in message.get("headers", []):
+        if name.lower() == b"content-type":
+            return value.split(b";")[0].strip() in STREAMING_TYPES
+    return False
@@ -0,0 +1,144 @@
+"""Opt-in slow MongoDB command log with explain() capture."""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import logging.handlers
+import threading
+import time
+
+from pymongo import MongoClient, monitoring
+
+from metrics import current_request_usage
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+SHAPE_FIELDS = ("filter", "query", "q", "u", "update", "pipeline", "sort", "key", "updates", "deletes")
+# Driver bookkeeping that explain() rejects inside the nested command
+SESSION_FIELDS = {"$db", "lsid", "$clusterTime", "txnNumber", "$readPreference", "autocommit", "startTransaction"}
+
+
+def summarize_plan(plan):
+    """Flatten a winning plan into its stage chain and the indexes it uses."""
+    stages = []
+    indexes = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        stages.append(node.get('stage'))
+        if node.get('indexName'):
+            indexes.append(node['indexName'])
+        if 'inputStage' in node:
+            pending.append(node['inputStage'])
+        pending.extend(node.get('inputStages', []))
+    return {"stages": stages, "indexes": indexes, "collscan": "COLLSCAN" in stages}
+
+
+def redact(value):
+    """Keep keys, operators and $field references; replace literal values with "?"."""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Arrays of values ($in) collapse to one placeholder; arrays of stages keep their shape
+        shapes = [redact(item) for item in value]
+        return shapes if any(isinstance(item, dict) for item in value) else ["?"] if value else []
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+
+def command_shape(command):
+    return {field: redact(command[field]) for field in SHAPE_FIELDS if field in command}
+
+
+class SlowCommandLog(monitoring.CommandListener):
+    """Logs commands slower than threshold_ms, as JSON lines, to a rotating file."""
+
+    def __init__(self, path, threshold_ms, mongo_url=None, explain=True, explain_interval=300,
+                 max_bytes=5 * 1024 * 1024, backup_count=5):
+        self.threshold_ms = threshold_ms
+        self.mongo_url = mongo_url
+        self.explain = explain and mongo_url is not None
+        self.explain_interval = explain_interval
+        self.pending = {}
+        self.last_explained = {}
+        self.lock = threading.Lock()
+        self.explain_client = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger = logging.getLogger("slow_queries")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(handler)
+
+    def started(self, event):
+        usage = current_request_usage.get()
+        with self.lock:
+            self.pending[(event.connection_id, event.request_id)] = (
+                dict(event.command), event.database_name, usage.route() if usage is not None else None
+            )
+
+    def failed(self, event):
+        with self.lock:
+            self.pending.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event):
+        with self.lock:
+            started = self.pending.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.threshold_ms:
+            return
+
+        command, database, route = started
+        target = command.get(event.command_name)
+        record = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "route": route or "background",
+            "database": database,
+            "collection": target if isinstance(target, str) else command.get("collection"),
+            "command": event.command_name,
+            "duration_ms": round(duration_ms, 3),
+            "shape": command_shape(command),
+        }
+
+        if self.explain and event.command_name in EXPLAINABLE and self._due(record):
+            # Explaining runs another command; keep it off the driver thread
+            self.executor.submit(self._explain_and_log, record, command, database)
+        else:
+            self.logger.info(json.dumps(record, default=str, ensure_ascii=False))
+
+    def _due(self, record):
+        """Explain each command shape at most once per explain_interval seconds."""
+        key = json.dumps([record["collection"], record["command"], record["shape"]], sort_keys=True, default=str)
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_explained.get(key, float("-inf")) < self.explain_interval:
+                return False
+            self.last_explained[key] = now
+            return True
+
+    def _explain_and_log(self, record, command, database):
+        try:
+            if self.explain_client is None:
+                # A separate client without listeners, so explains are not logged themselves
+                self.explain_client = MongoClient(self.mongo_url)
+            nested = {key: value for key, value in command.items() if key not in SESSION_FIELDS}
+            result = self.explain_client[database].command({"explain": nested, "verbosity": "executionStats"})
+            planner = result.get("queryPlanner", {})
+            winning_plan = planner.get("winningPlan", {})
+            stats = result.get("executionStats", {})
+            record["explain"] = {
+                **summarize_plan(winning_plan.get("queryPlan", winning_plan)),
+                "docs_examined": stats.get("totalDocsExamined"),
+                "keys_examined": stats.get("totalKeysExamined"),
+                "n_returned": stats.get("nReturned"),
+            }
+        except Exception as e:
+            record["explain_error"] = str(e)
+        self.logger.info(json.dumps(record, default=str, ensure_ascii=False))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.explain_client is not None:
+            self.explain_client.close()
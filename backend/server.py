@@ -1,23 +1,61 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from bson import ObjectId
+import asyncio
+import base64
+import binascii
+import contextvars
+import orjson
 import os
+import re
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+import functools
+import hashlib
+import inspect
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, date, timedelta
 
+from background import SideEffectQueue
+from cache import ResponseCache
+from events import EventBroker
+from metrics import AppMetrics, MetricsMiddleware
+from profiling import ProfilerMiddleware
+from querylog import SlowCommandLog, summarize_plan
+from storage import open_client
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Database connection: "mongo" (default) or "memory" for runs without MongoDB
+storage_backend = os.environ.get('STORAGE_BACKEND', 'mongo')
+mongo_url = os.environ['MONGO_URL'] if storage_backend == 'mongo' else None
+app_metrics = AppMetrics()
+command_listeners = [app_metrics.command_listener]
+
+# Opt-in slow command log: set SLOW_QUERY_MS to log commands at or over that many milliseconds
+slow_query_ms = os.environ.get('SLOW_QUERY_MS')
+slow_query_log = None
+if slow_query_ms and storage_backend == 'mongo':
+    slow_query_log = SlowCommandLog(
+        Path(os.environ.get('SLOW_QUERY_LOG_PATH', ROOT_DIR / 'logs' / 'slow_queries.log')),
+        threshold_ms=float(slow_query_ms),
+        mongo_url=mongo_url,
+        explain=os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() != 'false',
+        max_bytes=int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024)),
+        backup_count=int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 5)),
+    )
+    command_listeners.append(slow_query_log)
+
+client = open_client(storage_backend, mongo_url, event_listeners=command_listeners)
+db = client[os.environ['DB_NAME'] if storage_backend == 'mongo' else os.environ.get('DB_NAME', 'memory')]
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -38,7 +76,7 @@ class Task(BaseModel):
     priority: str = "medium"  # low, medium, high
     date: str  # YYYY-MM-DD format
     duration_minutes: int = 25
-    subtasks: List[dict] = []  # [{"title": str, "completed": bool}]
+    subtasks: List[dict] = []  # [{"id": str, "title": str, "completed": bool}]
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class TaskCreate(BaseModel):
@@ -60,6 +98,39 @@ class TaskUpdate(BaseModel):
     duration_minutes: Optional[int] = None
     subtasks: Optional[List[dict]] = None
 
+class TaskSelection(BaseModel):
+    # Tasks matching every given field; ids alone selects exactly those tasks
+    ids: Optional[List[str]] = None
+    date: Optional[str] = None
+    subject: Optional[str] = None
+    completed: Optional[bool] = None
+    priority: Optional[str] = None
+
+class TaskBulkChanges(BaseModel):
+    completed: Optional[bool] = None
+    date: Optional[str] = None
+    priority: Optional[str] = None
+
+class TaskBulkUpdate(TaskSelection):
+    changes: TaskBulkChanges
+
+class Subtask(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    title: str
+    completed: bool = False
+
+class SubtaskCreate(BaseModel):
+    title: str
+    completed: bool = False
+    position: Optional[int] = None  # Index to insert at; appended when omitted
+
+class SubtaskUpdate(BaseModel):
+    title: Optional[str] = None
+    completed: Optional[bool] = None
+
+class SubtaskMove(BaseModel):
+    position: int
+
 class PomodoroSession(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
@@ -128,12 +199,15 @@ class FocusTreeCreate(BaseModel):
 class UserProfile(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
-    id: str = "default_user"  # Single user for now
+    id: str = "default_user"  # The owning user's id
     level: int = 1
     experience: int = 0
     trees_planted: int = 0
     total_focus_minutes: int = 0
     character_type: str = "seed"  # seed, sprout, tree, forest
+    current_streak: int = 0
+    longest_streak: int = 0
+    last_active_date: Optional[str] = None  # YYYY-MM-DD of the latest work session
     notification_settings: dict = {
         "daily_summary": True,
         "task_reminders": True,
@@ -142,164 +216,1144 @@ class UserProfile(BaseModel):
     }
 
 
+# Indexes ensured at startup, per collection; every query is scoped by user_id, so it leads
+INDEXES = {
+    "tasks": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("completed", ASCENDING)]),
+    ],
+    "pomodoro_sessions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("session_type", ASCENDING), ("date", ASCENDING)]),
+    ],
+    "study_stats": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("subject", ASCENDING)]),
+    ],
+    "focus_trees": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "achievements": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("badge_type", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("earned_date", ASCENDING)]),
+    ],
+    "user_profile": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "daily_totals": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], unique=True),
+    ],
+    "subject_totals": [
+        IndexModel([("user_id", ASCENDING), ("subject", ASCENDING)], unique=True),
+    ],
+}
+
+# Single-user indexes replaced above; the unique ones would reject a second user's badges and totals
+LEGACY_INDEXES = {
+    "tasks": ["date_1_completed_1"],
+    "pomodoro_sessions": ["session_type_1_date_1"],
+    "study_stats": ["date_1_subject_1"],
+    "achievements": ["badge_type_1", "earned_date_1"],
+    "daily_totals": ["date_1"],
+}
+
+async def ensure_indexes():
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # Existing duplicates block a unique index; keep serving and report it
+            logger.error("Could not create indexes on %s: %s", collection, e)
+
+
+# Users
+# Requests act for the user named in X-User-Id; without the header they act for the original
+# single user, so existing clients keep working. Authenticating the header is the proxy's job.
+DEFAULT_USER_ID = "default_user"
+USER_ID_PATTERN = re.compile(r"[A-Za-z0-9_.@-]{1,64}")
+USER_COLLECTIONS = ("tasks", "pomodoro_sessions", "study_stats", "focus_trees", "achievements", "daily_totals",
+                    "subject_totals")
+
+async def current_user(x_user_id: Optional[str] = Header(None)):
+    if x_user_id is None:
+        return DEFAULT_USER_ID
+    if not USER_ID_PATTERN.fullmatch(x_user_id):
+        raise HTTPException(status_code=400, detail="Invalid X-User-Id header")
+    return x_user_id
+
+async def migrate_user_ids():
+    """Assign documents written before multi-user support to the default user, rebuild that user's
+    rollups and drop the old indexes."""
+    migrated = {}
+    for collection in USER_COLLECTIONS:
+        if collection in ROLLUPS:
+            # Rows summed from documents without user_id; the default user's rollups are rebuilt below
+            await db[collection].delete_many({"user_id": {"$exists": False}})
+        else:
+            result = await db[collection].update_many(
+                {"user_id": {"$exists": False}},
+                {"$set": {"user_id": DEFAULT_USER_ID}}
+            )
+            migrated[collection] = result.modified_count
+        existing = await db[collection].index_information()
+        for name in LEGACY_INDEXES.get(collection, []):
+            if name in existing:
+                await db[collection].drop_index(name)
+    
+    await ensure_indexes()
+    for _, rebuild in ROLLUPS.values():
+        await rebuild(DEFAULT_USER_ID)
+    _earned_badges.clear()
+    await touch(None, *USER_COLLECTIONS)
+    return migrated
+
+
+# Timestamps
+# Stored as native BSON dates; documents written before that hold isoformat strings until
+# `python manage.py migrate-timestamps` has run. Reads accept both.
+TIMESTAMP_FIELDS = {
+    "tasks": "created_at",
+    "pomodoro_sessions": "timestamp",
+    "study_stats": "timestamp",
+    "focus_trees": "timestamp",
+    "achievements": "earned_date",
+}
+
+def day_range(field, start_date, end_date):
+    """Query matching `field` on the days start_date..end_date inclusive, as dates or legacy strings."""
+    start = datetime.combine(start_date, datetime.min.time(), timezone.utc)
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time(), timezone.utc)
+    return {"$or": [
+        {field: {"$gte": start, "$lt": end}},
+        # BSON compares within a type, so this branch only sees unmigrated strings
+        {field: {"$gte": start.isoformat(), "$lt": end.isoformat()}},
+    ]}
+
+def parse_timestamp(value):
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def normalize_timestamps(docs, *fields):
+    """Parse legacy string timestamps in place, so they serialize like migrated ones."""
+    for doc in docs:
+        for field in fields:
+            if isinstance(doc.get(field), str):
+                doc[field] = parse_timestamp(doc[field])
+    return docs
+
+async def rewrite_in_batches(collection, query, projection, make_update, batch_size=1000):
+    """Apply make_update(doc) to every document matching query, in unordered bulk writes of batch_size.
+    
+    Returns the number of documents modified.
+    """
+    count = 0
+    operations = []
+    async for doc in db[collection].find(query, projection).batch_size(batch_size):
+        # Matching on the old values of the projected fields leaves documents rewritten meanwhile untouched
+        match = {"_id": doc['_id'], **{field: doc[field] for field in projection if field != "_id"}}
+        operations.append(UpdateOne(match, make_update(doc)))
+        if len(operations) >= batch_size:
+            count += (await db[collection].bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        count += (await db[collection].bulk_write(operations, ordered=False)).modified_count
+    return count
+
+async def migrate_timestamps(batch_size=1000):
+    """Convert isoformat string timestamps to native dates, streaming each collection in batches."""
+    migrated = {}
+    for collection, field in TIMESTAMP_FIELDS.items():
+        migrated[collection] = await rewrite_in_batches(
+            collection, {field: {"$type": "string"}}, {field: 1},
+            lambda doc: {"$set": {field: parse_timestamp(doc[field])}}, batch_size
+        )
+    
+    await touch(None, *TIMESTAMP_FIELDS)
+    return migrated
+
+
+# Daily Totals
+# One pre-aggregated document per date, kept current with $inc on every write path
+DAILY_TOTAL_FIELDS = (
+    "focus_minutes",
+    "work_sessions",
+    "questions_solved",
+    "correct_answers",
+    "study_minutes",
+    "tasks_total",
+    "tasks_completed",
+)
+
+async def bump_daily_totals(user_id, day, increments):
+    await db.daily_totals.update_one(
+        {"user_id": user_id, "date": day},
+        {"$inc": increments},
+        upsert=True
+    )
+    publish_daily_totals(user_id, day, increments)
+
+async def bump_daily_totals_many(user_id, rows):
+    """Apply (day, increments) pairs for one user, merged per day, in one bulk write."""
+    merged = {}
+    for day, increments in rows:
+        target = merged.setdefault(day, {})
+        for field, value in increments.items():
+            target[field] = target.get(field, 0) + value
+    
+    if merged:
+        await db.daily_totals.bulk_write([
+            UpdateOne({"user_id": user_id, "date": day}, {"$inc": increments}, upsert=True)
+            for day, increments in merged.items()
+        ], ordered=False)
+        for day, increments in merged.items():
+            publish_daily_totals(user_id, day, increments)
+
+def task_daily_increments(task, sign=1):
+    return {
+        "tasks_total": sign,
+        "tasks_completed": sign if task.get('completed') else 0
+    }
+
+async def sum_daily_totals(user_id, start, end):
+    """Sum every daily total field of a user between start and end inclusive, in the database."""
+    result = await db.daily_totals.aggregate([
+        {"$match": {"user_id": user_id, "date": {"$gte": start, "$lte": end}}},
+        {"$group": {"_id": None, **{field: {"$sum": f"${field}"} for field in DAILY_TOTAL_FIELDS}}}
+    ]).to_list(1)
+    totals = {field: 0 for field in DAILY_TOTAL_FIELDS}
+    if result:
+        totals.update({field: result[0][field] for field in DAILY_TOTAL_FIELDS})
+    return totals
+
+async def rebuild_daily_totals(user_id=None):
+    """Recompute the daily_totals collection from the raw collections, for one user or all of them."""
+    scope = {"user_id": user_id} if user_id is not None else {}
+    totals = {}
+    
+    def add(key, values):
+        row = totals.setdefault((key['user_id'], key['date']), {
+            "user_id": key['user_id'], "date": key['date'], **{field: 0 for field in DAILY_TOTAL_FIELDS}
+        })
+        for field, value in values.items():
+            row[field] += value
+    
+    # Documents from before multi-user support have no user_id and belong to the default user
+    by_user_day = {"user_id": {"$ifNull": ["$user_id", DEFAULT_USER_ID]}, "date": "$date"}
+    sessions = await db.pomodoro_sessions.aggregate([
+        {"$match": {**scope, "session_type": "work"}},
+        {"$group": {"_id": by_user_day, "minutes": {"$sum": "$duration_minutes"}, "count": {"$sum": 1}}}
+    ]).to_list(None)
+    for row in sessions:
+        add(row['_id'], {"focus_minutes": row['minutes'], "work_sessions": row['count']})
+    
+    stats = await db.study_stats.aggregate([
+        {"$match": scope},
+        {"$group": {
+            "_id": by_user_day,
+            "questions": {"$sum": "$questions_solved"},
+            "correct": {"$sum": "$correct_answers"},
+            "minutes": {"$sum": "$time_spent_minutes"}
+        }}
+    ]).to_list(None)
+    for row in stats:
+        add(row['_id'], {
+            "questions_solved": row['questions'],
+            "correct_answers": row['correct'],
+            "study_minutes": row['minutes']
+        })
+    
+    tasks = await db.tasks.aggregate([
+        {"$match": scope},
+        {"$group": {
+            "_id": by_user_day,
+            "total": {"$sum": 1},
+            "completed": {"$sum": {"$cond": ["$completed", 1, 0]}}
+        }}
+    ]).to_list(None)
+    for row in tasks:
+        add(row['_id'], {"tasks_total": row['total'], "tasks_completed": row['completed']})
+    
+    await db.daily_totals.delete_many(scope)
+    if totals:
+        await db.daily_totals.insert_many(list(totals.values()))
+    await touch(user_id, "daily_totals")
+    return len(totals)
+
+
+# Subject Totals
+# One running document per user and subject, kept current with $inc on every study stats write
+SUBJECT_TOTAL_FIELDS = ("questions_solved", "correct_answers", "time_spent_minutes")
+
+async def bump_subject_totals(user_id, stats):
+    """Fold study stats entries into their subjects' totals, merged per subject, in one bulk write."""
+    merged = {}
+    for entry in stats:
+        row = merged.setdefault(entry.subject, {"inc": dict.fromkeys(SUBJECT_TOTAL_FIELDS, 0), "last": entry.date})
+        for field in SUBJECT_TOTAL_FIELDS:
+            row['inc'][field] += getattr(entry, field)
+        row['last'] = max(row['last'], entry.date)
+    
+    if merged:
+        await db.subject_totals.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "subject": subject},
+                {"$inc": row['inc'], "$max": {"last_active_date": row['last']}},
+                upsert=True
+            )
+            for subject, row in merged.items()
+        ], ordered=False)
+
+async def rebuild_subject_totals(user_id=None):
+    """Recompute the subject_totals collection from study_stats, for one user or all of them."""
+    scope = {"user_id": user_id} if user_id is not None else {}
+    rows = await db.study_stats.aggregate([
+        {"$match": scope},
+        {"$group": {
+            "_id": {"user_id": {"$ifNull": ["$user_id", DEFAULT_USER_ID]}, "subject": "$subject"},
+            **{field: {"$sum": f"${field}"} for field in SUBJECT_TOTAL_FIELDS},
+            "last_active_date": {"$max": "$date"}
+        }}
+    ]).to_list(None)
+    
+    await db.subject_totals.delete_many(scope)
+    if rows:
+        await db.subject_totals.insert_many([
+            {**row['_id'], **{field: row[field] for field in SUBJECT_TOTAL_FIELDS},
+             "last_active_date": row['last_active_date']}
+            for row in rows
+        ])
+    await touch(user_id, "subject_totals")
+    return len(rows)
+
+
+# Rollup Backfill
+# Deployments upgraded without running the manage.py backfills would read zeros from their empty
+# rollups, so startup builds any rollup that is empty while its sources hold data
+ROLLUPS = {
+    "daily_totals": (("pomodoro_sessions", "study_stats", "tasks"), rebuild_daily_totals),
+    "subject_totals": (("study_stats",), rebuild_subject_totals),
+}
+
+async def has_documents(collection):
+    return await db[collection].find_one({}, {"_id": 1}) is not None
+
+async def backfill_empty_rollups():
+    for rollup, (sources, rebuild) in ROLLUPS.items():
+        if await has_documents(rollup) or not any([await has_documents(source) for source in sources]):
+            continue
+        try:
+            rows = await rebuild()
+        except OperationFailure as e:
+            # Another worker starting at the same time got there first
+            logger.warning("Could not backfill %s: %s", rollup, e)
+        else:
+            logger.info("Backfilled %d %s documents", rows, rollup)
+
+
+# Pagination
+# List routes page over the indexed _id key; the continuation token is returned in X-Next-Cursor
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# The owner is implied by the request; _id is kept for the cursor
+PAGE_PROJECTION = {"user_id": 0}
+
+def encode_cursor(object_id):
+    return base64.urlsafe_b64encode(object_id.binary).decode().rstrip("=")
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raw = b""
+    # Any 12 bytes make an ObjectId; ObjectId itself raises TypeError for other lengths
+    if len(raw) != 12:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ObjectId(raw)
+
+def json_default(value):
+    # orjson encodes datetimes itself; anything else it cannot (ObjectId) goes out as a string
+    return str(value)
+
+async def stream_ndjson(cursor):
+    async for doc in cursor:
+        doc.pop('_id', None)
+        yield orjson.dumps(doc, default=json_default, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE)
+
+async def paginate(request, response, collection, query, limit=None, cursor=None):
+    """Return one page of documents in _id order, or stream them all as NDJSON if the client asks."""
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    
+    if cursor:
+        query = {**query, "_id": {"$gt": decode_cursor(cursor)}}
+    
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        documents = collection.find(query, PAGE_PROJECTION).sort("_id", ASCENDING)
+        if limit is not None:
+            documents = documents.limit(limit)
+        return StreamingResponse(stream_ndjson(documents), media_type=NDJSON_MEDIA_TYPE)
+    
+    page_size = limit or DEFAULT_PAGE_SIZE
+    documents = collection.find(query, PAGE_PROJECTION).sort("_id", ASCENDING)
+    docs = await documents.limit(page_size + 1).to_list(page_size + 1)
+    
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1]['_id'])
+    
+    for doc in docs:
+        doc.pop('_id')
+    
+    return docs
+
+
+# Batch Ingest
+MAX_BATCH_SIZE = 1000
+
+def validate_batch(items, model):
+    """Validate raw items one by one; return the valid (index, model) pairs and per-item results."""
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {MAX_BATCH_SIZE} items")
+    
+    valid = []
+    results = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            results.append({
+                "index": index,
+                "status": "invalid",
+                "errors": [{"loc": list(error['loc']), "msg": error['msg']} for error in e.errors()]
+            })
+    return valid, results
+
+def batch_response(results, created):
+    for index, obj in created:
+        results.append({"index": index, "status": "created", "id": obj.id})
+    results.sort(key=lambda result: result['index'])
+    return {"created": len(created), "failed": len(results) - len(created), "results": results}
+
+
+# Response Cache
+# Read routes are served from memory while the data versions of the collections they read are unchanged
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', 512)),
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', 60))
+)
+
+def cached_response(*depends_on):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            request = kwargs.get('request')
+            if request is not None and NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+                return await func(**kwargs)
+            
+            response = kwargs.get('response')
+            user_id = kwargs.get('user_id')
+            params = tuple(sorted(
+                (name, value) for name, value in kwargs.items() if name not in ('request', 'response')
+            ))
+            # Values such as today's totals and streak roll over at midnight
+            versions = await read_versions(user_id, depends_on)
+            key = (func.__name__, date.today().isoformat(), versions, params)
+            
+            hit, cached = response_cache.get(key)
+            if hit:
+                value, headers = cached
+                if response is not None:
+                    response.headers.update(headers)
+                return value
+            
+            # Versions are read before the route runs, so a write landing meanwhile misses next time
+            value = await func(**kwargs)
+            headers = dict(response.headers) if response is not None else {}
+            response_cache.set(key, (value, headers), depends_on, user_id)
+            return value
+        return wrapper
+    return decorator
+
+
+# Data Versions
+# Per-user write counters, one field per collection, kept in the database so that writes from
+# every worker and from the manage commands reach cached reads and ETags; "*" counts writes
+# that span all users
+ALL_USERS = "*"
+# Lets cached_response reuse the versions with_etag read for the same request
+_request_versions = contextvars.ContextVar("request_versions", default=None)
+
+async def touch(user_id, *collections):
+    """Record a write to the user's collections, or to every user's with user_id None."""
+    response_cache.invalidate(*collections, user_id=user_id)
+    await db.data_versions.update_one(
+        {"_id": ALL_USERS if user_id is None else user_id},
+        # A new document gets a new epoch, so tags issued before the counters were lost never match
+        {"$inc": {name: 1 for name in collections}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+        upsert=True
+    )
+
+async def read_versions(user_id, depends_on):
+    """A string that changes whenever any of the given collections is written for the user."""
+    reused = _request_versions.get()
+    if reused is not None and reused[0] == (user_id, depends_on):
+        return reused[1]
+    
+    docs = await db.data_versions.find({"_id": {"$in": [ALL_USERS, user_id]}}).to_list(2)
+    by_id = {doc['_id']: doc for doc in docs}
+    parts = []
+    for key in (ALL_USERS, user_id):
+        doc = by_id.get(key, {})
+        parts.append(doc.get('epoch', '0'))
+        parts.extend(str(doc.get(name, 0)) for name in depends_on)
+    return ".".join(parts)
+
+
+# Conditional GET
+# Read routes tag responses with the write versions of the collections they read; a client
+# presenting the current tag in If-None-Match gets a 304 before any query runs
+def if_none_match(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison: W/ prefixes do not matter for GET
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def with_etag(*depends_on):
+    def decorator(func):
+        parameters = inspect.signature(func).parameters
+        injected = [
+            inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, annotation=annotation)
+            for name, annotation in (("request", Request), ("response", Response)) if name not in parameters
+        ]
+        
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            request = kwargs['request']
+            response = kwargs['response']
+            for parameter in injected:
+                kwargs.pop(parameter.name)
+            if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+                return await func(**kwargs)
+            
+            # The same URL answers differently per user and per day (today's totals, streak)
+            params = {key: value for key, value in kwargs.items() if key not in ("request", "response")}
+            params = repr((func.__name__, date.today().isoformat(), sorted(params.items())))
+            digest = hashlib.blake2s(params.encode(), digest_size=8).hexdigest()
+            # Taken before running the route, so a write landing meanwhile yields a newer tag next time
+            versions = await read_versions(kwargs.get('user_id'), depends_on)
+            etag = f'W/"{versions}.{digest}"'
+            headers = {"ETag": etag, "Vary": "X-User-Id"}
+            if if_none_match(request, etag):
+                return Response(status_code=304, headers=headers)
+            
+            token = _request_versions.set(((kwargs.get('user_id'), depends_on), versions))
+            try:
+                result = await func(**kwargs)
+            finally:
+                _request_versions.reset(token)
+            (result if isinstance(result, Response) else response).headers.update(headers)
+            return result
+        
+        wrapper.__signature__ = inspect.signature(func).replace(parameters=[*parameters.values(), *injected])
+        return wrapper
+    return decorator
+
+
+# Fast JSON
+# List routes return documents this app wrote through its own models, so revalidating every row
+# against response_model is redundant; routes opt in with @fast_json(Model) and go straight to
+# orjson. FAST_JSON_ROUTES holds each route's switch, so both paths can be compared per route.
+FAST_JSON_ROUTES = {}
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content):
+        # UTC as "Z", matching what the Pydantic serializer emits
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_UTC_Z)
+
+def fast_json(model, enabled=True):
+    """Serve a route's list of stored documents with orjson, trimmed to the model's fields.
+    
+    Legacy string timestamps are parsed first; unlike response_model validation this does not fill defaults.
+    """
+    fields = tuple(model.model_fields)
+    timestamps = tuple(name for name, field in model.model_fields.items() if field.annotation is datetime)
+    
+    def decorator(func):
+        FAST_JSON_ROUTES[func.__name__] = enabled
+        
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            result = await func(**kwargs)
+            if not FAST_JSON_ROUTES[func.__name__] or isinstance(result, Response):
+                return result
+            
+            content = [{field: doc[field] for field in fields if field in doc} for doc in result]
+            # Returning a Response bypasses FastAPI's merge of headers set on the injected one
+            response = kwargs.get('response')
+            return FastJSONResponse(normalize_timestamps(content, *timestamps),
+                                    headers=dict(response.headers) if response is not None else None)
+        return wrapper
+    return decorator
+
+
+# Change Events
+# Write paths push compact deltas of derived state to the user's open /events streams
+event_broker = EventBroker(queue_size=int(os.environ.get('EVENT_QUEUE_SIZE', 100)))
+EVENT_STREAM_MAX_SECONDS = float(os.environ.get('EVENT_STREAM_MAX_SECONDS', 300))
+
+def level_for(experience):
+    return 1 + (experience // 100)  # Every 100 XP = 1 level
+
+def publish_daily_totals(user_id, day, increments):
+    changed = {field: value for field, value in increments.items() if value}
+    if changed:
+        event_broker.publish(user_id, "daily_totals", {"date": day, "inc": changed})
+
+def publish_profile_change(user_id, before, increments):
+    """Push a profile increment given the profile's experience before it was applied."""
+    if not event_broker.listening(user_id):
+        return
+    previous = (before or {}).get('experience', 0)
+    experience = previous + increments.get('experience', 0)
+    level = level_for(experience)
+    event_broker.publish(user_id, "profile", {"inc": increments, "experience": experience, "level": level})
+    if level > level_for(previous):
+        event_broker.publish(user_id, "level_up", {"level": level, "previous_level": level_for(previous)})
+
+@api_router.get("/events")
+async def stream_events(user_id: str = Depends(current_user)):
+    """Server-Sent Events stream of the user's profile, badge and daily total changes.
+
+    Like every route, the stream belongs to the X-User-Id the proxy sets; EventSource sends the
+    same cookies as the page, so the proxy identifies it as it does any other request.
+    Clients should refetch state after each "ready" or "resync" event; nothing is replayed.
+    """
+    subscription = event_broker.subscribe(user_id)
+    return StreamingResponse(
+        event_broker.stream(subscription, max_seconds=EVENT_STREAM_MAX_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Deferred Side Effects
+# Profile, streak and badge updates run on a background queue after the response is sent
+side_effects = SideEffectQueue(
+    concurrency=int(os.environ.get('SIDE_EFFECT_CONCURRENCY', 4)),
+    max_retries=int(os.environ.get('SIDE_EFFECT_MAX_RETRIES', 3))
+)
+
+# Jobs run at least once: a step that failed after its write landed is run again. Profile
+# increments therefore record their source in applied_sources and skip sources already there.
+APPLIED_SOURCES_KEPT = 50
+
+async def apply_profile_increments(user_id, source_id, increments, projection):
+    """$inc a user's profile once per source; return the profile before it, or None if already applied."""
+    async def attempt():
+        return await db.user_profile.find_one_and_update(
+            {"id": user_id, "applied_sources": {"$ne": source_id}},
+            {
+                "$inc": increments,
+                "$push": {"applied_sources": {"$each": [source_id], "$slice": -APPLIED_SOURCES_KEPT}}
+            },
+            projection=projection
+        )
+    
+    before = await attempt()
+    if before is None and await db.user_profile.find_one({"id": user_id}, {"_id": 1}) is None:
+        await ensure_profile(user_id)
+        before = await attempt()
+    return before
+
+async def increment_profile(user_id, source_id, increments):
+    before = await apply_profile_increments(user_id, source_id, increments, {"_id": 0, "experience": 1})
+    await touch(user_id, "user_profile")
+    if before is not None:
+        publish_profile_change(user_id, before, increments)
+
+def work_session_steps(user_id, sessions):
+    """Job steps for a user's recorded work sessions: profile totals first, then the streak."""
+    before = {}
+    
+    async def update_profile():
+        increments = {
+            "total_focus_minutes": sum(s.duration_minutes for s in sessions),
+            "experience": 10 * len(sessions)
+        }
+        projection = {**STREAK_PROJECTION, "experience": 1}
+        # The first session's id stands for the job, so a retry finds its own increment
+        before['profile'] = await apply_profile_increments(user_id, sessions[0].id, increments, projection)
+        await touch(user_id, "user_profile")
+        if before['profile'] is not None:
+            publish_profile_change(user_id, before['profile'], increments)
+        else:
+            # Applied by an earlier attempt; the streak fields it did not touch are still current
+            before['profile'] = await db.user_profile.find_one({"id": user_id}, STREAK_PROJECTION)
+    
+    async def update_streak():
+        await record_streak_activity(user_id, before['profile'], [s.date for s in sessions])
+    
+    return [update_profile, update_streak]
+
+
 # Task Routes
 @api_router.post("/tasks", response_model=Task)
-async def create_task(input: TaskCreate):
+async def create_task(input: TaskCreate, user_id: str = Depends(current_user)):
     task_dict = input.model_dump()
+    task_dict['subtasks'] = with_subtask_ids(task_dict['subtasks'])
     task_obj = Task(**task_dict)
     
-    doc = task_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc = {**task_obj.model_dump(), "user_id": user_id}
     
     await db.tasks.insert_one(doc)
+    await bump_daily_totals(user_id, task_obj.date, task_daily_increments(doc))
+    await touch(user_id, "tasks", "daily_totals")
     return task_obj
 
+@api_router.post("/tasks/batch")
+async def create_tasks_batch(items: List[dict], user_id: str = Depends(current_user)):
+    valid, results = validate_batch(items, TaskCreate)
+    created = [
+        (index, Task(**{**item.model_dump(), "subtasks": with_subtask_ids(item.subtasks)})) for index, item in valid
+    ]
+    
+    if created:
+        docs = [{**task_obj.model_dump(), "user_id": user_id} for _, task_obj in created]
+        
+        await db.tasks.insert_many(docs)
+        await bump_daily_totals_many(user_id, ((doc['date'], task_daily_increments(doc)) for doc in docs))
+        await touch(user_id, "tasks", "daily_totals")
+    
+    return batch_response(results, created)
+
 @api_router.get("/tasks", response_model=List[Task])
-async def get_tasks(date: Optional[str] = None):
-    query = {}
+@with_etag("tasks")
+@fast_json(Task)
+async def get_tasks(request: Request, response: Response, date: Optional[str] = None,
+                    limit: Optional[int] = None, cursor: Optional[str] = None,
+                    user_id: str = Depends(current_user)):
+    query = {"user_id": user_id}
     if date:
         query['date'] = date
     
-    tasks = await db.tasks.find(query, {"_id": 0}).to_list(1000)
-    
-    for task in tasks:
-        if isinstance(task['created_at'], str):
-            task['created_at'] = datetime.fromisoformat(task['created_at'])
-    
-    return tasks
+    return await paginate(request, response, db.tasks, query, limit, cursor)
 
 @api_router.put("/tasks/{task_id}", response_model=Task)
-async def update_task(task_id: str, input: TaskUpdate):
+async def update_task(task_id: str, input: TaskUpdate, user_id: str = Depends(current_user)):
     update_data = {k: v for k, v in input.model_dump().items() if v is not None}
     
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
+    if 'subtasks' in update_data:
+        update_data['subtasks'] = with_subtask_ids(update_data['subtasks'])
     
-    result = await db.tasks.find_one_and_update(
-        {"id": task_id},
+    previous = await db.tasks.find_one_and_update(
+        {"id": task_id, "user_id": user_id},
         {"$set": update_data},
-        return_document=True
+        return_document=ReturnDocument.BEFORE
     )
     
-    if not result:
+    if not previous:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    result.pop('_id', None)
-    if isinstance(result['created_at'], str):
-        result['created_at'] = datetime.fromisoformat(result['created_at'])
+    previous.pop('_id', None)
+    result = {**previous, **update_data}
+    
+    # Move the task between day rollups when its date or completion changed
+    if previous['date'] != result['date'] or previous.get('completed') != result['completed']:
+        await bump_daily_totals_many(user_id, [
+            (previous['date'], task_daily_increments(previous, -1)),
+            (result['date'], task_daily_increments(result))
+        ])
+    await touch(user_id, "tasks", "daily_totals")
     
     return Task(**result)
 
 @api_router.delete("/tasks/{task_id}")
-async def delete_task(task_id: str):
-    result = await db.tasks.delete_one({"id": task_id})
+async def delete_task(task_id: str, user_id: str = Depends(current_user)):
+    result = await db.tasks.find_one_and_delete(
+        {"id": task_id, "user_id": user_id}, {"_id": 0, "date": 1, "completed": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not result:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    await bump_daily_totals(user_id, result['date'], task_daily_increments(result, -1))
+    await touch(user_id, "tasks", "daily_totals")
+    
     return {"message": "Task deleted successfully"}
 
 
+# Bulk Task Routes
+# The selection is walked in _id order a chunk at a time, and each chunk's (date, completed)
+# groups are written separately, so every group's own matched count gives its daily_totals delta
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 500))
+
+def task_selection_query(selection, user_id):
+    criteria = {k: v for k, v in selection.model_dump(include=set(TaskSelection.model_fields)).items()
+                if v is not None}
+    if not criteria:
+        raise HTTPException(status_code=400, detail="Select tasks by ids or at least one field")
+    
+    ids = criteria.pop('ids', None)
+    query = {"user_id": user_id, **criteria}
+    if ids is not None:
+        if len(ids) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per request")
+        query['id'] = {"$in": ids}
+    return query
+
+async def task_group_chunks(query):
+    """Yield the selected tasks a chunk at a time, as {(date, completed): [_id, ...]}."""
+    last = None
+    while True:
+        page = query if last is None else {**query, "_id": {"$gt": last}}
+        documents = db.tasks.find(page, {"_id": 1, "date": 1, "completed": 1}).sort("_id", ASCENDING)
+        tasks = await documents.limit(BULK_CHUNK_SIZE).to_list(BULK_CHUNK_SIZE)
+        if not tasks:
+            return
+        
+        groups = {}
+        for task in tasks:
+            groups.setdefault((task['date'], task.get('completed')), []).append(task['_id'])
+        yield groups
+        
+        if len(tasks) < BULK_CHUNK_SIZE:
+            return
+        last = tasks[-1]['_id']
+
+def task_group_filter(user_id, group, ids):
+    # A task edited between the read and the write no longer matches its group and is skipped
+    day, completed = group
+    return {"_id": {"$in": ids}, "user_id": user_id, "date": day, "completed": completed}
+
+@api_router.post("/tasks/bulk-update")
+async def bulk_update_tasks(input: TaskBulkUpdate, user_id: str = Depends(current_user)):
+    """Complete, uncomplete, reschedule or reprioritize the selected tasks."""
+    changes = {k: v for k, v in input.changes.model_dump().items() if v is not None}
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    query = task_selection_query(input, user_id)
+    matched = modified = 0
+    async for groups in task_group_chunks(query):
+        results = await asyncio.gather(*(
+            db.tasks.update_many(task_group_filter(user_id, group, ids), {"$set": changes})
+            for group, ids in groups.items()
+        ))
+        
+        rows = []
+        for (day, completed), result in zip(groups, results):
+            matched += result.matched_count
+            modified += result.modified_count
+            before = {"date": day, "completed": completed}
+            after = {**before, **changes}
+            if result.matched_count and (after['date'] != day or after['completed'] != completed):
+                rows.append((day, task_daily_increments(before, -result.matched_count)))
+                rows.append((after['date'], task_daily_increments(after, result.matched_count)))
+        await bump_daily_totals_many(user_id, rows)
+    
+    if matched:
+        await touch(user_id, "tasks", "daily_totals")
+    return {"matched": matched, "modified": modified}
+
+@api_router.post("/tasks/bulk-delete")
+async def bulk_delete_tasks(input: TaskSelection, user_id: str = Depends(current_user)):
+    query = task_selection_query(input, user_id)
+    matched = deleted = 0
+    async for groups in task_group_chunks(query):
+        results = await asyncio.gather(*(
+            db.tasks.delete_many(task_group_filter(user_id, group, ids)) for group, ids in groups.items()
+        ))
+        
+        rows = []
+        for ((day, completed), ids), result in zip(groups.items(), results):
+            matched += len(ids)
+            deleted += result.deleted_count
+            if result.deleted_count:
+                rows.append((day, task_daily_increments({"completed": completed}, -result.deleted_count)))
+        await bump_daily_totals_many(user_id, rows)
+    
+    if deleted:
+        await touch(user_id, "tasks", "daily_totals")
+    return {"matched": matched, "deleted": deleted}
+
+
+# Subtask Routes
+# Each route changes one element of a task's subtasks array in place and returns only that
+# fragment, so concurrent edits to different subtasks do not overwrite each other
+def with_subtask_ids(subtasks):
+    return [{"id": str(uuid.uuid4()), **subtask, "completed": subtask.get('completed', False)} for subtask in subtasks]
+
+SUBTASK_MOVE_ATTEMPTS = 5
+
+def subtask_filter(task_id, user_id, subtask_id):
+    return {"id": task_id, "user_id": user_id, "subtasks": {"$elemMatch": {"id": subtask_id}}}
+
+@api_router.post("/tasks/{task_id}/subtasks", response_model=Subtask)
+async def create_subtask(task_id: str, input: SubtaskCreate, user_id: str = Depends(current_user)):
+    subtask = Subtask(title=input.title, completed=input.completed)
+    push = {"$each": [subtask.model_dump()]}
+    if input.position is not None:
+        push["$position"] = max(input.position, 0)
+    
+    result = await db.tasks.update_one({"id": task_id, "user_id": user_id}, {"$push": {"subtasks": push}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Task not found")
+    await touch(user_id, "tasks")
+    
+    return subtask
+
+@api_router.patch("/tasks/{task_id}/subtasks/{subtask_id}")
+async def update_subtask(task_id: str, subtask_id: str, input: SubtaskUpdate,
+                         user_id: str = Depends(current_user)):
+    """Rename or check/uncheck one subtask; returns its id and the fields that changed."""
+    changes = {k: v for k, v in input.model_dump().items() if v is not None}
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    result = await db.tasks.update_one(
+        subtask_filter(task_id, user_id, subtask_id),
+        {"$set": {f"subtasks.$[subtask].{field}": value for field, value in changes.items()}},
+        array_filters=[{"subtask.id": subtask_id}]
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Subtask not found")
+    await touch(user_id, "tasks")
+    
+    return {"id": subtask_id, **changes}
+
+@api_router.put("/tasks/{task_id}/subtasks/{subtask_id}/position")
+async def move_subtask(task_id: str, subtask_id: str, input: SubtaskMove, user_id: str = Depends(current_user)):
+    # A move cannot be one $pull + $push on the same array, so it is a compare-and-swap of the
+    # array against the version it was computed from
+    for _ in range(SUBTASK_MOVE_ATTEMPTS):
+        task = await db.tasks.find_one(subtask_filter(task_id, user_id, subtask_id), {"_id": 0, "subtasks": 1})
+        if task is None:
+            raise HTTPException(status_code=404, detail="Subtask not found")
+        
+        subtasks = task['subtasks']
+        index = next(i for i, subtask in enumerate(subtasks) if subtask.get('id') == subtask_id)
+        position = min(max(input.position, 0), len(subtasks) - 1)
+        reordered = subtasks[:index] + subtasks[index + 1:]
+        reordered.insert(position, subtasks[index])
+        
+        result = await db.tasks.update_one(
+            {"id": task_id, "user_id": user_id, "subtasks": subtasks},
+            {"$set": {"subtasks": reordered}}
+        )
+        if result.matched_count:
+            await touch(user_id, "tasks")
+            return {"id": subtask_id, "position": position}
+    
+    raise HTTPException(status_code=409, detail="Subtasks changed concurrently, retry the move")
+
+@api_router.delete("/tasks/{task_id}/subtasks/{subtask_id}")
+async def delete_subtask(task_id: str, subtask_id: str, user_id: str = Depends(current_user)):
+    result = await db.tasks.update_one(
+        subtask_filter(task_id, user_id, subtask_id),
+        {"$pull": {"subtasks": {"id": subtask_id}}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Subtask not found")
+    await touch(user_id, "tasks")
+    
+    return {"message": "Subtask deleted successfully"}
+
+async def migrate_subtask_ids(batch_size=1000):
+    """Give subtasks written before the subtask routes existed an id, so the routes can address them."""
+    legacy = {"subtasks": {"$elemMatch": {"id": {"$exists": False}}}}
+    count = await rewrite_in_batches(
+        "tasks", legacy, {"subtasks": 1},
+        lambda task: {"$set": {"subtasks": with_subtask_ids(task['subtasks'])}}, batch_size
+    )
+    
+    await touch(None, "tasks")
+    return count
+
+
 # Pomodoro Routes
 @api_router.post("/pomodoro", response_model=PomodoroSession)
-async def create_pomodoro_session(input: PomodoroSessionCreate):
+async def create_pomodoro_session(input: PomodoroSessionCreate, user_id: str = Depends(current_user)):
     session_dict = input.model_dump()
     session_obj = PomodoroSession(**session_dict)
     
-    doc = session_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
+    doc = {**session_obj.model_dump(), "user_id": user_id}
     
     await db.pomodoro_sessions.insert_one(doc)
     
-    # Update user profile
+    # Update daily totals now; profile, streak and achievements are deferred
     if session_obj.session_type == "work":
-        await db.user_profile.update_one(
-            {"id": "default_user"},
-            {"$inc": {"total_focus_minutes": session_obj.duration_minutes, "experience": 10}},
-            upsert=True
+        await bump_daily_totals(user_id, session_obj.date, {
+            "focus_minutes": session_obj.duration_minutes,
+            "work_sessions": 1
+        })
+        side_effects.submit(
+            "pomodoro",
+            *work_session_steps(user_id, [session_obj]),
+            functools.partial(check_and_award_achievements, user_id)
         )
-    
-    # Check achievements
-    await check_and_award_achievements()
+    await touch(user_id, "pomodoro_sessions", "daily_totals")
     
     return session_obj
 
+@api_router.post("/pomodoro/batch")
+async def create_pomodoro_sessions_batch(items: List[dict], user_id: str = Depends(current_user)):
+    valid, results = validate_batch(items, PomodoroSessionCreate)
+    created = [(index, PomodoroSession(**item.model_dump())) for index, item in valid]
+    
+    if not created:
+        return batch_response(results, created)
+    
+    docs = [{**session_obj.model_dump(), "user_id": user_id} for _, session_obj in created]
+    
+    await db.pomodoro_sessions.insert_many(docs)
+    
+    # One combined profile update and achievement pass for the whole batch
+    work_sessions = [session_obj for _, session_obj in created if session_obj.session_type == "work"]
+    if work_sessions:
+        await bump_daily_totals_many(
+            user_id, ((s.date, {"focus_minutes": s.duration_minutes, "work_sessions": 1}) for s in work_sessions)
+        )
+        side_effects.submit(
+            "pomodoro-batch",
+            *work_session_steps(user_id, work_sessions),
+            functools.partial(check_and_award_achievements, user_id)
+        )
+    await touch(user_id, "pomodoro_sessions", "daily_totals")
+    
+    return batch_response(results, created)
+
 @api_router.get("/pomodoro/stats")
-async def get_pomodoro_stats(date: Optional[str] = None):
-    query = {}
+@with_etag("pomodoro_sessions")
+async def get_pomodoro_stats(request: Request, response: Response, date: Optional[str] = None,
+                             limit: Optional[int] = None, cursor: Optional[str] = None,
+                             user_id: str = Depends(current_user)):
+    query = {"user_id": user_id}
     if date:
         query['date'] = date
     
-    sessions = await db.pomodoro_sessions.find(query, {"_id": 0}).to_list(1000)
+    # Totals cover every matching session, not just the returned page
+    totals, sessions = await asyncio.gather(
+        db.pomodoro_sessions.aggregate([
+            {"$match": {**query, "session_type": "work"}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "minutes": {"$sum": "$duration_minutes"}}}
+        ]).to_list(1),
+        paginate(request, response, db.pomodoro_sessions, query, limit, cursor)
+    )
+    if isinstance(sessions, StreamingResponse):
+        return sessions
     
-    work_sessions = [s for s in sessions if s['session_type'] == 'work']
-    total_work_time = sum(s['duration_minutes'] for s in work_sessions)
-    total_sessions = len(work_sessions)
+    total_sessions = totals[0]['count'] if totals else 0
+    total_work_time = totals[0]['minutes'] if totals else 0
     
-    return {
+    # Serialized like the other list routes: UTC as "Z", legacy string timestamps parsed first
+    return FastJSONResponse({
         "total_sessions": total_sessions,
         "total_work_minutes": total_work_time,
-        "sessions": sessions
-    }
+        "sessions": normalize_timestamps(sessions, TIMESTAMP_FIELDS["pomodoro_sessions"])
+    }, headers=dict(response.headers))
 
 
 # Study Stats Routes
 @api_router.post("/study-stats", response_model=StudyStats)
-async def create_study_stats(input: StudyStatsCreate):
+async def create_study_stats(input: StudyStatsCreate, user_id: str = Depends(current_user)):
     stats_dict = input.model_dump()
     stats_obj = StudyStats(**stats_dict)
     
-    doc = stats_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
+    doc = {**stats_obj.model_dump(), "user_id": user_id}
     
     await db.study_stats.insert_one(doc)
+    await bump_daily_totals(user_id, stats_obj.date, {
+        "questions_solved": stats_obj.questions_solved,
+        "correct_answers": stats_obj.correct_answers,
+        "study_minutes": stats_obj.time_spent_minutes
+    })
+    await bump_subject_totals(user_id, [stats_obj])
     
-    # Update experience
-    await db.user_profile.update_one(
-        {"id": "default_user"},
-        {"$inc": {"experience": stats_obj.questions_solved * 2}},
-        upsert=True
+    # Experience and achievements are deferred
+    side_effects.submit(
+        "study-stats",
+        functools.partial(increment_profile, user_id, stats_obj.id, {"experience": stats_obj.questions_solved * 2}),
+        functools.partial(check_and_award_achievements, user_id)
     )
-    
-    # Check achievements
-    await check_and_award_achievements()
+    await touch(user_id, "study_stats", "daily_totals", "subject_totals")
     
     return stats_obj
 
+@api_router.post("/study-stats/batch")
+async def create_study_stats_batch(items: List[dict], user_id: str = Depends(current_user)):
+    valid, results = validate_batch(items, StudyStatsCreate)
+    created = [(index, StudyStats(**item.model_dump())) for index, item in valid]
+    
+    if not created:
+        return batch_response(results, created)
+    
+    docs = [{**stats_obj.model_dump(), "user_id": user_id} for _, stats_obj in created]
+    
+    await db.study_stats.insert_many(docs)
+    await bump_daily_totals_many(user_id, (
+        (s.date, {
+            "questions_solved": s.questions_solved,
+            "correct_answers": s.correct_answers,
+            "study_minutes": s.time_spent_minutes
+        })
+        for _, s in created
+    ))
+    await bump_subject_totals(user_id, (s for _, s in created))
+    
+    # One combined experience update and achievement pass for the batch
+    side_effects.submit(
+        "study-stats-batch",
+        functools.partial(
+            increment_profile, user_id, created[0][1].id,
+            {"experience": sum(s.questions_solved for _, s in created) * 2}
+        ),
+        functools.partial(check_and_award_achievements, user_id)
+    )
+    await touch(user_id, "study_stats", "daily_totals", "subject_totals")
+    
+    return batch_response(results, created)
+
 @api_router.get("/study-stats")
-async def get_study_stats(date: Optional[str] = None, subject: Optional[str] = None):
-    query = {}
+@with_etag("study_stats")
+@fast_json(StudyStats)
+async def get_study_stats(request: Request, response: Response, date: Optional[str] = None,
+                          subject: Optional[str] = None, limit: Optional[int] = None,
+                          cursor: Optional[str] = None, user_id: str = Depends(current_user)):
+    query = {"user_id": user_id}
     if date:
         query['date'] = date
     if subject:
         query['subject'] = subject
     
-    stats = await db.study_stats.find(query, {"_id": 0}).to_list(1000)
-    
-    return stats
+    return await paginate(request, response, db.study_stats, query, limit, cursor)
 
 @api_router.get("/study-stats/summary")
-async def get_study_stats_summary():
-    stats = await db.study_stats.aggregate([
-        {
-            "$group": {
-                "_id": "$subject",
-                "total_questions": {"$sum": "$questions_solved"},
-                "total_correct": {"$sum": "$correct_answers"},
-                "total_time": {"$sum": "$time_spent_minutes"}
-            }
-        }
-    ]).to_list(1000)
+@with_etag("subject_totals")
+@cached_response("subject_totals")
+async def get_study_stats_summary(user_id: str = Depends(current_user)):
+    totals = await db.subject_totals.find({"user_id": user_id}, {"_id": 0}).sort("subject", 1).to_list(1000)
     
     result = []
-    for stat in stats:
-        accuracy = (stat['total_correct'] / stat['total_questions'] * 100) if stat['total_questions'] > 0 else 0
+    for total in totals:
+        questions = total.get('questions_solved', 0)
+        accuracy = (total.get('correct_answers', 0) / questions * 100) if questions > 0 else 0
         result.append({
-            "subject": stat['_id'],
-            "total_questions": stat['total_questions'],
-            "total_correct": stat['total_correct'],
-            "total_time_minutes": stat['total_time'],
-            "accuracy": round(accuracy, 1)
+            "subject": total['subject'],
+            "total_questions": questions,
+            "total_correct": total.get('correct_answers', 0),
+            "total_time_minutes": total.get('time_spent_minutes', 0),
+            "accuracy": round(accuracy, 1),
+            "last_active_date": total.get('last_active_date')
         })
     
     return result
@@ -307,212 +1361,279 @@ async def get_study_stats_summary():
 
 # Achievement Routes
 @api_router.get("/achievements", response_model=List[Achievement])
-async def get_achievements():
-    achievements = await db.achievements.find({}, {"_id": 0}).to_list(1000)
-    
-    for achievement in achievements:
-        if isinstance(achievement['earned_date'], str):
-            achievement['earned_date'] = datetime.fromisoformat(achievement['earned_date'])
-    
-    return achievements
-
-async def check_and_award_achievements():
-    # Check for various achievements
-    
-    # First pomodoro
-    pomodoro_count = await db.pomodoro_sessions.count_documents({"session_type": "work"})
-    if pomodoro_count == 1:
-        existing = await db.achievements.find_one({"badge_type": "first_pomodoro"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="first_pomodoro",
-                title="İlk Pomodoro!",
-                description="İlk çalışma seansını tamamladın!",
-                icon="🌱"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
-    
-    # 10 pomodoros
-    if pomodoro_count >= 10:
-        existing = await db.achievements.find_one({"badge_type": "10_pomodoros"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="10_pomodoros",
-                title="10 Pomodoro!",
-                description="10 çalışma seansı tamamladın!",
-                icon="🌿"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
-    
-    # Question milestones
-    total_questions = await db.study_stats.aggregate([
+@with_etag("achievements")
+@fast_json(Achievement)
+@cached_response("achievements")
+async def get_achievements(request: Request, response: Response, limit: Optional[int] = None,
+                           cursor: Optional[str] = None, user_id: str = Depends(current_user)):
+    return await paginate(request, response, db.achievements, {"user_id": user_id}, limit, cursor)
+
+# Badge rules: a badge is awarded once its metric reaches the threshold
+ACHIEVEMENT_RULES = [
+    {"badge_type": "first_pomodoro", "metric": "work_sessions", "threshold": 1,
+     "title": "İlk Pomodoro!", "description": "İlk çalışma seansını tamamladın!", "icon": "🌱"},
+    {"badge_type": "10_pomodoros", "metric": "work_sessions", "threshold": 10,
+     "title": "10 Pomodoro!", "description": "10 çalışma seansı tamamladın!", "icon": "🌿"},
+    {"badge_type": "100_questions", "metric": "total_questions", "threshold": 100,
+     "title": "100 Soru!", "description": "100 soru çözdün! Harika gidiyorsun!", "icon": "🎯"},
+    {"badge_type": "500_questions", "metric": "total_questions", "threshold": 500,
+     "title": "500 Soru!", "description": "500 soru tamamladın! İnanılmaz!", "icon": "🌟"},
+    {"badge_type": "1000_questions", "metric": "total_questions", "threshold": 1000,
+     "title": "1000 Soru!", "description": "1000 soru! Sen bir efsanesin!", "icon": "💎"},
+    {"badge_type": "3_day_streak", "metric": "streak", "threshold": 3,
+     "title": "3 Gün Serisi!", "description": "3 gün üst üste çalıştın!", "icon": "🔥"},
+    {"badge_type": "7_day_streak", "metric": "streak", "threshold": 7,
+     "title": "Haftalık Şampiyon!", "description": "7 gün boyunca çalışma disiplini!", "icon": "⚡"},
+    {"badge_type": "14_day_streak", "metric": "streak", "threshold": 14,
+     "title": "İki Hafta Savaşçısı!", "description": "14 gün kesintisiz çalışma!", "icon": "🌠"},
+    {"badge_type": "30_day_streak", "metric": "streak", "threshold": 30,
+     "title": "Aylık Master!", "description": "30 gün! İnanılmaz bir disiplin!", "icon": "👑"},
+]
+
+# Badge types already stored in db.achievements per user, loaded on first use
+EARNED_BADGES_CACHE_SIZE = 10000
+_earned_badges: dict = {}
+
+async def get_earned_badges(user_id):
+    earned = _earned_badges.get(user_id)
+    if earned is None:
+        if len(_earned_badges) >= EARNED_BADGES_CACHE_SIZE:
+            # Drop the oldest user; their set is reloaded on their next write
+            _earned_badges.pop(next(iter(_earned_badges)))
+        earned = _earned_badges[user_id] = set(await db.achievements.distinct("badge_type", {"user_id": user_id}))
+    return earned
+
+async def count_work_sessions(user_id):
+    return await db.pomodoro_sessions.count_documents({"user_id": user_id, "session_type": "work"})
+
+async def sum_questions_solved(user_id):
+    result = await db.study_stats.aggregate([
+        {"$match": {"user_id": user_id}},
         {"$group": {"_id": None, "total": {"$sum": "$questions_solved"}}}
     ]).to_list(1)
-    
-    if total_questions and total_questions[0]['total'] >= 100:
-        existing = await db.achievements.find_one({"badge_type": "100_questions"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="100_questions",
-                title="100 Soru!",
-                description="100 soru çözdün! Harika gidiyorsun!",
-                icon="🎯"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
-    
-    if total_questions and total_questions[0]['total'] >= 500:
-        existing = await db.achievements.find_one({"badge_type": "500_questions"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="500_questions",
-                title="500 Soru!",
-                description="500 soru tamamladın! İnanılmaz!",
-                icon="🌟"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
-    
-    if total_questions and total_questions[0]['total'] >= 1000:
-        existing = await db.achievements.find_one({"badge_type": "1000_questions"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="1000_questions",
-                title="1000 Soru!",
-                description="1000 soru! Sen bir efsanesin!",
-                icon="💎"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
-    
-    # Streak achievements
-    streak = await calculate_streak()
-    
-    if streak >= 3:
-        existing = await db.achievements.find_one({"badge_type": "3_day_streak"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="3_day_streak",
-                title="3 Gün Serisi!",
-                description="3 gün üst üste çalıştın!",
-                icon="🔥"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
-    
-    if streak >= 7:
-        existing = await db.achievements.find_one({"badge_type": "7_day_streak"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="7_day_streak",
-                title="Haftalık Şampiyon!",
-                description="7 gün boyunca çalışma disiplini!",
-                icon="⚡"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
-    
-    if streak >= 14:
-        existing = await db.achievements.find_one({"badge_type": "14_day_streak"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="14_day_streak",
-                title="İki Hafta Savaşçısı!",
-                description="14 gün kesintisiz çalışma!",
-                icon="🌠"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
-    
-    if streak >= 30:
-        existing = await db.achievements.find_one({"badge_type": "30_day_streak"})
-        if not existing:
-            achievement = Achievement(
-                badge_type="30_day_streak",
-                title="Aylık Master!",
-                description="30 gün! İnanılmaz bir disiplin!",
-                icon="👑"
-            )
-            doc = achievement.model_dump()
-            doc['earned_date'] = doc['earned_date'].isoformat()
-            await db.achievements.insert_one(doc)
+    return result[0]['total'] if result else 0
+
+async def collect_achievement_metrics(user_id, names):
+    """Compute the requested metrics of a user concurrently and return them as one snapshot."""
+    sources = {
+        "work_sessions": count_work_sessions,
+        "total_questions": sum_questions_solved,
+        "streak": calculate_streak,
+    }
+    names = sorted(names)
+    values = await asyncio.gather(*(sources[name](user_id) for name in names))
+    return dict(zip(names, values))
 
-async def calculate_streak():
-    all_dates = await db.pomodoro_sessions.distinct("date")
-    all_dates = sorted([d for d in all_dates if d], reverse=True)
+async def check_and_award_achievements(user_id):
+    earned = await get_earned_badges(user_id)
+    pending = [rule for rule in ACHIEVEMENT_RULES if rule['badge_type'] not in earned]
+    if not pending:
+        return []
+    
+    metrics = await collect_achievement_metrics(user_id, {rule['metric'] for rule in pending})
+    
+    awarded = []
+    for rule in pending:
+        if metrics[rule['metric']] >= rule['threshold']:
+            awarded.append(Achievement(
+                badge_type=rule['badge_type'],
+                title=rule['title'],
+                description=rule['description'],
+                icon=rule['icon']
+            ))
+    
+    if not awarded:
+        return []
+    
+    # $setOnInsert keeps the write idempotent if another request got there first
+    operations = []
+    for achievement in awarded:
+        doc = {**achievement.model_dump(), "user_id": user_id}
+        operations.append(UpdateOne(
+            {"user_id": user_id, "badge_type": achievement.badge_type},
+            {"$setOnInsert": doc},
+            upsert=True
+        ))
+    result = await db.achievements.bulk_write(operations, ordered=False)
+    await touch(user_id, "achievements")
+    # Only upserted badges are new; the rest were awarded by a concurrent check
+    for index in result.upserted_ids:
+        event_broker.publish(user_id, "achievement", awarded[index].model_dump())
+    
+    earned.update(achievement.badge_type for achievement in awarded)
+    return awarded
+
+# Streak state lives on the profile and is advanced as work sessions are recorded
+STREAK_PROJECTION = {"_id": 0, "current_streak": 1, "longest_streak": 1, "last_active_date": 1}
+
+async def calculate_streak(user_id):
+    profile = await db.user_profile.find_one({"id": user_id}, STREAK_PROJECTION)
     
-    if not all_dates:
-        return 0
+    if profile is None or 'last_active_date' not in profile:
+        profile = await recompute_streak(user_id)
     
-    streak = 0
-    current_date = date.today()
+    # A streak only counts while today's session is in
+    if profile['last_active_date'] != date.today().isoformat():
+        return 0
     
-    for session_date_str in all_dates:
+    return profile['current_streak']
+
+async def record_streak_activity(user_id, profile, session_dates):
+    """Advance a user's streak fields for recorded work session dates, given the profile before the write."""
+    today = date.today()
+    days = set()
+    for value in session_dates:
         try:
-            session_date = date.fromisoformat(session_date_str)
-            expected_date = current_date - timedelta(days=streak)
-            
-            if session_date == expected_date:
-                streak += 1
-            elif session_date < expected_date:
-                break
-        except:
+            day = date.fromisoformat(value)
+        except (TypeError, ValueError):
             continue
+        if day <= today:
+            days.add(day)
+    
+    if not days:
+        return
+    
+    if profile is None or 'last_active_date' not in profile:
+        await recompute_streak(user_id)
+        return
+    
+    last_active = profile['last_active_date']
+    last_date = date.fromisoformat(last_active) if last_active else None
+    if last_date is not None and min(days) < last_date:
+        # A backfilled day can join two runs, so rebuild from history
+        await recompute_streak(user_id)
+        return
+    
+    current = profile.get('current_streak', 0)
+    longest = profile.get('longest_streak', 0)
+    previous = last_date
+    for day in sorted(days):
+        if day == previous:
+            continue
+        if previous is not None and day - previous == timedelta(days=1):
+            current += 1
+        else:
+            current = 1
+        longest = max(longest, current)
+        previous = day
+    
+    if previous == last_date:
+        return
+    
+    state = {
+        "current_streak": current,
+        "longest_streak": longest,
+        "last_active_date": previous.isoformat()
+    }
+    result = await db.user_profile.update_one(
+        {"id": user_id, "last_active_date": last_active},
+        {"$set": state}
+    )
     
-    return streak
+    # Another request moved the streak first
+    if result.matched_count == 0:
+        await recompute_streak(user_id)
+    else:
+        await touch(user_id, "user_profile")
+
+async def recompute_streak(user_id):
+    """Rebuild a user's streak fields from their full work session history."""
+    today = date.today()
+    active_days = set()
+    for value in await db.pomodoro_sessions.distinct("date", {"user_id": user_id, "session_type": "work"}):
+        try:
+            active_day = date.fromisoformat(value)
+        except (TypeError, ValueError):
+            continue
+        if active_day <= today:
+            active_days.add(active_day)
+    
+    current = 0
+    longest = 0
+    previous = None
+    for active_day in sorted(active_days):
+        if previous is not None and active_day - previous == timedelta(days=1):
+            current += 1
+        else:
+            current = 1
+        longest = max(longest, current)
+        previous = active_day
+    
+    state = {
+        "current_streak": current,
+        "longest_streak": longest,
+        "last_active_date": previous.isoformat() if previous else None
+    }
+    await db.user_profile.update_one(
+        {"id": user_id},
+        {"$set": state},
+        upsert=True
+    )
+    await touch(user_id, "user_profile")
+    return state
 
 
 # Focus Tree Routes
 @api_router.post("/focus-trees", response_model=FocusTree)
-async def create_focus_tree(input: FocusTreeCreate):
+async def create_focus_tree(input: FocusTreeCreate, user_id: str = Depends(current_user)):
     tree_dict = input.model_dump()
     tree_obj = FocusTree(**tree_dict)
     
-    doc = tree_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
+    doc = {**tree_obj.model_dump(), "user_id": user_id}
     
     await db.focus_trees.insert_one(doc)
     
-    # Update user stats
+    # Update user stats in the background
     if tree_obj.survived:
-        await db.user_profile.update_one(
-            {"id": "default_user"},
-            {"$inc": {"trees_planted": 1, "experience": 25}},
-            upsert=True
+        side_effects.submit(
+            "focus-tree",
+            functools.partial(increment_profile, user_id, tree_obj.id, {"trees_planted": 1, "experience": 25})
         )
+    await touch(user_id, "focus_trees")
     
     return tree_obj
 
 @api_router.get("/focus-trees")
-async def get_focus_trees():
-    trees = await db.focus_trees.find({}, {"_id": 0}).to_list(1000)
-    return trees
+@with_etag("focus_trees")
+@fast_json(FocusTree)
+async def get_focus_trees(request: Request, response: Response, limit: Optional[int] = None,
+                          cursor: Optional[str] = None, user_id: str = Depends(current_user)):
+    return await paginate(request, response, db.focus_trees, {"user_id": user_id}, limit, cursor)
 
 
 # User Profile Routes
+async def ensure_profile(user_id):
+    """Create the user's default profile unless a route or side effect already has."""
+    # Streak fields stay unset, so the first read rebuilds them from any existing history
+    defaults = UserProfile(id=user_id).model_dump(exclude={"id", *STREAK_PROJECTION})
+    try:
+        await db.user_profile.update_one(
+            {"id": user_id},
+            {"$setOnInsert": defaults},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent upsert created it between our match and insert
+        pass
+
+# applied_sources is side effect bookkeeping, not part of the profile
+PROFILE_PROJECTION = {"_id": 0, "applied_sources": 0}
+
 @api_router.get("/profile")
-async def get_profile():
-    profile = await db.user_profile.find_one({"id": "default_user"}, {"_id": 0})
+@with_etag("user_profile")
+@cached_response("user_profile")
+async def get_profile(user_id: str = Depends(current_user)):
+    profile = await db.user_profile.find_one({"id": user_id}, PROFILE_PROJECTION)
     
     if not profile:
-        # Create default profile
-        default_profile = UserProfile().model_dump()
-        await db.user_profile.insert_one(default_profile)
-        return default_profile
+        await ensure_profile(user_id)
+        profile = await db.user_profile.find_one({"id": user_id}, PROFILE_PROJECTION)
+    
+    # Profiles first created by a side effect's upsert only hold the fields it wrote
+    profile = {**UserProfile(id=user_id).model_dump(), **profile}
     
     # Calculate level from experience
-    exp = profile.get('experience', 0)
-    level = 1 + (exp // 100)  # Every 100 XP = 1 level
+    level = level_for(profile.get('experience', 0))
     profile['level'] = level
     
     # Determine character type
@@ -528,104 +1649,94 @@ async def get_profile():
     return profile
 
 @api_router.put("/profile/settings")
-async def update_profile_settings(settings: dict):
+async def update_profile_settings(settings: dict, user_id: str = Depends(current_user)):
     result = await db.user_profile.update_one(
-        {"id": "default_user"},
+        {"id": user_id},
         {"$set": {"notification_settings": settings}},
         upsert=True
     )
+    await touch(user_id, "user_profile")
     return {"message": "Settings updated"}
 
 
 # Dashboard Stats
 @api_router.get("/dashboard/stats")
-async def get_dashboard_stats():
+@with_etag("daily_totals", "achievements", "user_profile")
+@cached_response("daily_totals", "achievements", "user_profile")
+async def get_dashboard_stats(user_id: str = Depends(current_user)):
     today = date.today().isoformat()
     
-    # Today's tasks
-    today_tasks = await db.tasks.count_documents({"date": today})
-    completed_tasks = await db.tasks.count_documents({"date": today, "completed": True})
-    
-    # Today's pomodoro sessions
-    today_pomodoros = await db.pomodoro_sessions.count_documents({"date": today, "session_type": "work"})
-    
-    # Today's study time
-    today_stats = await db.study_stats.find({"date": today}, {"_id": 0}).to_list(1000)
-    today_study_time = sum(s.get('time_spent_minutes', 0) for s in today_stats)
-    today_questions = sum(s.get('questions_solved', 0) for s in today_stats)
-    
-    # Total achievements
-    total_achievements = await db.achievements.count_documents({})
-    
-    # Calculate streak
-    streak = await calculate_streak()
+    # Today's rollup, total achievements and streak are independent reads
+    totals, total_achievements, streak = await asyncio.gather(
+        db.daily_totals.find_one({"user_id": user_id, "date": today}, {"_id": 0}),
+        db.achievements.count_documents({"user_id": user_id}),
+        calculate_streak(user_id)
+    )
+    totals = totals or {}
     
     return {
-        "today_tasks": today_tasks,
-        "completed_tasks": completed_tasks,
-        "today_pomodoros": today_pomodoros,
-        "today_study_minutes": today_study_time,
-        "today_questions": today_questions,
+        "today_tasks": totals.get('tasks_total', 0),
+        "completed_tasks": totals.get('tasks_completed', 0),
+        "today_pomodoros": totals.get('work_sessions', 0),
+        "today_study_minutes": totals.get('study_minutes', 0),
+        "today_questions": totals.get('questions_solved', 0),
         "total_achievements": total_achievements,
         "current_streak": streak
     }
 
 
 # Heat Map Data
+MAX_HEATMAP_DAYS = 3660
+
 @api_router.get("/heatmap")
-async def get_heatmap_data(days: int = 90):
+@with_etag("daily_totals")
+async def get_heatmap_data(days: int = Query(90, ge=0, le=MAX_HEATMAP_DAYS), compact: bool = False,
+                           user_id: str = Depends(current_user)):
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
     
-    # Get all pomodoro sessions
-    sessions = await db.pomodoro_sessions.find(
-        {"session_type": "work"},
-        {"_id": 0, "date": 1, "duration_minutes": 1}
-    ).to_list(10000)
-    
-    # Group by date
-    heatmap_data = {}
-    for session in sessions:
-        session_date = session.get('date')
-        if session_date:
-            if session_date not in heatmap_data:
-                heatmap_data[session_date] = 0
-            heatmap_data[session_date] += session.get('duration_minutes', 0)
+    rows = await db.daily_totals.find(
+        {
+            "user_id": user_id,
+            "date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()},
+            "focus_minutes": {"$gt": 0}
+        },
+        {"_id": 0, "date": 1, "focus_minutes": 1}
+    ).to_list(days + 1)
+    
+    heatmap_data = {row['date']: row['focus_minutes'] for row in rows}
+    
+    if compact:
+        # Dense per-day minutes, index 0 is start_date
+        return {
+            "start": start_date.isoformat(),
+            "minutes": [
+                heatmap_data.get((start_date + timedelta(days=offset)).isoformat(), 0)
+                for offset in range(days + 1)
+            ]
+        }
     
     return heatmap_data
 
 
 # Weekly Report
 @api_router.get("/reports/weekly")
-async def get_weekly_report():
+@with_etag("daily_totals", "achievements")
+async def get_weekly_report(user_id: str = Depends(current_user)):
     end_date = date.today()
     start_date = end_date - timedelta(days=7)
     
-    # Pomodoro sessions
-    pomodoros = await db.pomodoro_sessions.count_documents({
-        "session_type": "work",
-        "date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}
-    })
-    
-    # Study stats
-    stats = await db.study_stats.find({
-        "date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    
-    total_questions = sum(s.get('questions_solved', 0) for s in stats)
-    total_correct = sum(s.get('correct_answers', 0) for s in stats)
-    total_time = sum(s.get('time_spent_minutes', 0) for s in stats)
+    # Rollup sums and new achievements are independent reads
+    totals, achievements = await asyncio.gather(
+        sum_daily_totals(user_id, start_date.isoformat(), end_date.isoformat()),
+        db.achievements.count_documents({"user_id": user_id, **day_range("earned_date", start_date, end_date)})
+    )
     
-    # Tasks completed
-    tasks_completed = await db.tasks.count_documents({
-        "completed": True,
-        "date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}
-    })
-    
-    # New achievements
-    achievements = await db.achievements.count_documents({
-        "earned_date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}
-    })
+    pomodoros = totals['work_sessions']
+    total_questions = totals['questions_solved']
+    total_correct = totals['correct_answers']
+    total_time = totals['study_minutes']
+    tasks_completed = totals['tasks_completed']
     
     return {
         "week_start": start_date.isoformat(),
@@ -640,6 +1751,165 @@ async def get_weekly_report():
     }
 
 
+# Range Reports
+# Built from daily_totals, so cost follows the days in range rather than the raw documents
+REPORT_GRANULARITIES = ("day", "week", "month")
+MAX_REPORT_DAYS = 3660
+
+def bucket_start(day, granularity):
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # Weeks start on Monday
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start, granularity):
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+def report_values(row):
+    questions = row['questions_solved']
+    return {
+        "pomodoros": row['work_sessions'],
+        "focus_minutes": row['focus_minutes'],
+        "questions": questions,
+        "correct": row['correct_answers'],
+        "accuracy": round((row['correct_answers'] / questions * 100) if questions > 0 else 0, 1),
+        "study_minutes": row['study_minutes'],
+        "tasks_completed": row['tasks_completed'],
+        "new_achievements": row['new_achievements'],
+    }
+
+@api_router.get("/reports")
+@with_etag("daily_totals", "achievements")
+@cached_response("daily_totals", "achievements")
+async def get_report(start: str = Query(..., alias="from"), end: str = Query(..., alias="to"),
+                     granularity: str = "day", user_id: str = Depends(current_user)):
+    try:
+        start_date = date.fromisoformat(start)
+        end_date = date.fromisoformat(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from and to must be YYYY-MM-DD dates")
+    if granularity not in REPORT_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(REPORT_GRANULARITIES)}")
+    if not 0 <= (end_date - start_date).days < MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"to must be on or after from, at most {MAX_REPORT_DAYS} days later"
+        )
+    
+    rows, achievements = await asyncio.gather(
+        db.daily_totals.find(
+            {"user_id": user_id, "date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}},
+            {"_id": 0, "date": 1, **{field: 1 for field in DAILY_TOTAL_FIELDS}}
+        ).to_list(None),
+        db.achievements.find(
+            {"user_id": user_id, **day_range("earned_date", start_date, end_date)},
+            {"_id": 0, "earned_date": 1}
+        ).to_list(None)
+    )
+    
+    # Every bucket is listed, empty ones included, so charts need no gap filling
+    buckets = {}
+    bucket = bucket_start(start_date, granularity)
+    while bucket <= end_date:
+        buckets[bucket] = {field: 0 for field in (*DAILY_TOTAL_FIELDS, "new_achievements")}
+        bucket = next_bucket(bucket, granularity)
+    
+    for row in rows:
+        # Dates are unvalidated strings; one that does not parse is left out, as in recompute_streak
+        try:
+            target = buckets.get(bucket_start(date.fromisoformat(row['date']), granularity))
+        except (TypeError, ValueError):
+            continue
+        if target is None:
+            continue
+        for field in DAILY_TOTAL_FIELDS:
+            target[field] += row.get(field, 0)
+    for achievement in achievements:
+        earned = achievement['earned_date']
+        if isinstance(earned, str):
+            earned = parse_timestamp(earned)
+        buckets[bucket_start(earned.date(), granularity)]['new_achievements'] += 1
+    
+    totals = {field: sum(row[field] for row in buckets.values()) for field in (*DAILY_TOTAL_FIELDS, "new_achievements")}
+    return {
+        "from": start_date.isoformat(),
+        "to": end_date.isoformat(),
+        "granularity": granularity,
+        "buckets": [
+            {
+                # Edge buckets are clipped to the requested range
+                "start": max(bucket, start_date).isoformat(),
+                "end": min(next_bucket(bucket, granularity) - timedelta(days=1), end_date).isoformat(),
+                **report_values(row)
+            }
+            for bucket, row in buckets.items()
+        ],
+        "totals": report_values(totals),
+    }
+
+
+# Query Plan Audit
+def query_shapes():
+    """Representative filters for the queries each route issues."""
+    today = date.today().isoformat()
+    week_ago = (date.today() - timedelta(days=7)).isoformat()
+    user = {"user_id": DEFAULT_USER_ID}
+    return [
+        {"route": "GET /api/tasks", "collection": "tasks", "filter": {**user, "date": today}},
+        {"route": "PUT/DELETE /api/tasks/{task_id}", "collection": "tasks", "filter": {"id": "example", **user}},
+        {"route": "GET /api/pomodoro/stats", "collection": "pomodoro_sessions", "filter": {**user, "date": today}},
+        {"route": "POST /api/pomodoro", "collection": "pomodoro_sessions",
+         "filter": {**user, "session_type": "work"}},
+        {"route": "POST /api/pomodoro", "collection": "user_profile", "filter": {"id": DEFAULT_USER_ID}},
+        {"route": "GET /api/study-stats", "collection": "study_stats",
+         "filter": {**user, "date": today, "subject": "example"}},
+        {"route": "GET /api/study-stats/summary", "collection": "subject_totals", "filter": user},
+        {"route": "POST /api/study-stats", "collection": "achievements",
+         "filter": {**user, "badge_type": "first_pomodoro"}},
+        {"route": "GET /api/dashboard/stats", "collection": "daily_totals", "filter": {**user, "date": today}},
+        {"route": "GET /api/heatmap", "collection": "daily_totals",
+         "filter": {**user, "date": {"$gte": week_ago, "$lte": today}, "focus_minutes": {"$gt": 0}}},
+        {"route": "GET /api/reports/weekly", "collection": "daily_totals",
+         "filter": {**user, "date": {"$gte": week_ago, "$lte": today}}},
+        {"route": "GET /api/reports/weekly", "collection": "achievements",
+         "filter": {**user, **day_range("earned_date", date.today() - timedelta(days=7), date.today())}},
+    ]
+
+@api_router.get("/admin/query-plans")
+async def get_query_plans():
+    report = []
+    for shape in query_shapes():
+        explain = await db[shape['collection']].find(shape['filter']).explain()
+        winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+        # Plans from the slot-based engine nest the classic tree under queryPlan
+        report.append({**shape, **summarize_plan(winning_plan.get('queryPlan', winning_plan))})
+    return report
+
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats():
+    return response_cache.stats()
+
+
+@api_router.get("/admin/events")
+async def get_event_stats():
+    return event_broker.stats()
+
+
+@api_router.get("/admin/side-effects")
+async def get_side_effect_stats():
+    return side_effects.stats()
+
+@api_router.post("/admin/side-effects/flush")
+async def flush_side_effects():
+    await side_effects.flush()
+    return side_effects.stats()
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -649,8 +1919,37 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Profile-File", "ETag"],
 )
 
+# Opt-in request profiling: with PROFILE_DIR and PROFILE_TOKEN set, requests sending the token
+# in `X-Profile` are run under cProfile
+if os.environ.get('PROFILE_DIR') and os.environ.get('PROFILE_TOKEN'):
+    app.add_middleware(ProfilerMiddleware, directory=Path(os.environ['PROFILE_DIR']),
+                       token=os.environ['PROFILE_TOKEN'])
+elif os.environ.get('PROFILE_DIR'):
+    logging.getLogger(__name__).warning("PROFILE_DIR is set without PROFILE_TOKEN; request profiling is off")
+app.add_middleware(MetricsMiddleware, metrics=app_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    cache_stats = response_cache.stats()
+    queue_stats = side_effects.stats()
+    event_stats = event_broker.stats()
+    extra = [
+        ("response_cache_hits_total", "counter", "Response cache hits", cache_stats['hits']),
+        ("response_cache_misses_total", "counter", "Response cache misses", cache_stats['misses']),
+        ("response_cache_entries", "gauge", "Entries held in the response cache", cache_stats['size']),
+        ("side_effect_queue_depth", "gauge", "Deferred jobs queued or running", queue_stats['depth']),
+        ("side_effect_jobs_failed_total", "counter", "Deferred jobs that exhausted retries", queue_stats['failed']),
+        ("side_effect_last_lag_seconds", "gauge", "Enqueue-to-start delay of the latest job",
+         queue_stats['last_lag_seconds']),
+        ("event_stream_subscriptions", "gauge", "Open /events streams", event_stats['subscriptions']),
+        ("event_stream_resyncs_total", "counter", "Subscribers that overflowed and were told to resync",
+         event_stats['resyncs']),
+    ]
+    return PlainTextResponse(app_metrics.render(extra), media_type="text/plain; version=0.0.4")
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -658,6 +1957,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_ensure_indexes():
+    await ensure_indexes()
+    await backfill_empty_rollups()
+    side_effects.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Drain deferred profile and achievement updates before the connection goes away
+    await side_effects.stop()
     client.close()
+    if slow_query_log is not None:
+        slow_query_log.close()
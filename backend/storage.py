@@ -0,0 +1,767 @@
+"""Storage backends for the API.
+
+The routes talk to collections through the subset of the Motor collection API they
+use: insert, find with projection/sort/limit, find_one(_and_update/_and_delete),
+update/upsert with $set/$inc/$max/$setOnInsert/$unset/$push/$pull and array filters, delete, count_documents, distinct,
+bulk_write and aggregate ($match/$group/$sort/$limit/$project). Motor itself is the
+MongoDB implementation; ``MemoryClient`` is an in-process implementation of the same
+surface for benchmarks and CI runs without a database.
+"""
+import copy
+import datetime
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+
+def open_client(backend, mongo_url=None, event_listeners=()):
+    """Return a client for the configured backend ("mongo" or "memory")."""
+    if backend == "memory":
+        return MemoryClient()
+    if backend == "mongo":
+        # Timestamps are stored as BSON dates and read back as UTC-aware datetimes
+        return AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=list(event_listeners))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+# Values and paths
+
+_MISSING = object()
+
+
+def _type_rank(value):
+    # BSON comparison order for the types the app stores
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime.datetime):
+        return 9
+    return 10
+
+
+# $type aliases (by name only) for the ranks above that hold a single BSON type
+_TYPE_ALIASES = {"string": 3, "object": 4, "array": 5, "objectId": 7, "bool": 8, "date": 9}
+
+
+def _sort_key(value):
+    if value is _MISSING:
+        value = None
+    return (_type_rank(value), value if value is not None else 0)
+
+
+def _get_path(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[int(part)]
+        else:
+            target = target.setdefault(part, {})
+    if isinstance(target, list):
+        target[int(parts[-1])] = value
+    else:
+        target[parts[-1]] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    target = _get_path(doc, ".".join(parts[:-1])) if len(parts) > 1 else doc
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+
+
+# Query matching
+
+def _compare(value, operand, op):
+    if _type_rank(value) != _type_rank(operand):
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    return value <= operand
+
+
+def _equals(value, operand):
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _match_operators(value, condition):
+    for op, operand in condition.items():
+        if op == "$eq":
+            matched = _equals(value, operand)
+        elif op == "$ne":
+            matched = not _equals(value, operand)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            matched = value is not _MISSING and _compare(value, operand, op)
+        elif op == "$in":
+            matched = any(_equals(value, item) for item in operand)
+        elif op == "$nin":
+            matched = not any(_equals(value, item) for item in operand)
+        elif op == "$exists":
+            matched = (value is not _MISSING) == bool(operand)
+        elif op == "$type" and operand in _TYPE_ALIASES:
+            matched = value is not _MISSING and _type_rank(value) == _TYPE_ALIASES[operand]
+        elif op == "$elemMatch":
+            matched = isinstance(value, list) and any(
+                isinstance(item, dict) and matches(item, operand) for item in value
+            )
+        else:
+            raise NotImplementedError(f"Query operator {op} is not supported by the memory backend")
+        if not matched:
+            return False
+    return True
+
+
+def _is_operator_dict(value):
+    return isinstance(value, dict) and value and all(key.startswith("$") for key in value)
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif _is_operator_dict(condition):
+            if not _match_operators(_get_path(doc, key), condition):
+                return False
+        elif not _equals(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+# Projection and updates
+
+def project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    include_id = projection.get("_id", 1)
+
+    if any(fields.values()):
+        result = {key: copy.deepcopy(doc[key]) for key in fields if key in doc}
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+
+    result = {key: copy.deepcopy(value) for key, value in doc.items() if key not in fields}
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _matches_element(item, condition):
+    """Match one array element against a $pull condition or an array filter."""
+    if isinstance(condition, dict) and not _is_operator_dict(condition):
+        return isinstance(item, dict) and matches(item, condition)
+    if _is_operator_dict(condition):
+        return _match_operators(item, condition)
+    return _equals(item, condition)
+
+
+def _resolve_paths(doc, path, array_filters):
+    """Expand `$[name]` segments of an update path into the concrete paths they select."""
+    if "$[" not in path:
+        return [path]
+    prefix, _, rest = path.partition(".$[")
+    name, _, suffix = rest.partition("]")
+    items = _get_path(doc, prefix)
+    if not isinstance(items, list):
+        return []
+    condition = {}
+    for array_filter in array_filters or ():
+        for key, value in array_filter.items():
+            head, _, field = key.partition(".")
+            if head != name:
+                continue
+            if field:
+                condition[field] = value
+            else:
+                condition.update(value if _is_operator_dict(value) else {"$eq": value})
+    paths = []
+    for index, item in enumerate(items):
+        if not condition or _matches_element(item, condition):
+            paths.extend(_resolve_paths(doc, f"{prefix}.{index}{suffix}", array_filters))
+    return paths
+
+
+def _apply_update(doc, update, inserting=False, array_filters=None):
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for field, value in fields.items():
+            for path in _resolve_paths(doc, field, array_filters):
+                _apply_operator(doc, op, path, value)
+
+
+def _apply_operator(doc, op, path, value):
+    if op in ("$set", "$setOnInsert"):
+        _set_path(doc, path, copy.deepcopy(value))
+    elif op == "$inc":
+        current = _get_path(doc, path)
+        _set_path(doc, path, (0 if current is _MISSING else current) + value)
+    elif op == "$max":
+        current = _get_path(doc, path)
+        if current is _MISSING or _sort_key(value) > _sort_key(current):
+            _set_path(doc, path, copy.deepcopy(value))
+    elif op == "$unset":
+        _unset_path(doc, path)
+    elif op == "$push":
+        current = _get_path(doc, path)
+        items = [] if current is _MISSING else current
+        if isinstance(value, dict) and "$each" in value:
+            position = value.get("$position", len(items))
+            new_items = copy.deepcopy(value["$each"])
+        else:
+            position = len(items)
+            new_items = [copy.deepcopy(value)]
+        items = items[:position] + new_items + items[position:]
+        if isinstance(value, dict) and "$slice" in value:
+            # Negative keeps the last n items, like MongoDB
+            limit = value["$slice"]
+            items = items[limit:] if limit < 0 else items[:limit]
+        _set_path(doc, path, items)
+    elif op == "$pull":
+        current = _get_path(doc, path)
+        if isinstance(current, list):
+            _set_path(doc, path, [item for item in current if not _matches_element(item, value)])
+    else:
+        raise NotImplementedError(f"Update operator {op} is not supported by the memory backend")
+
+
+def _upsert_seed(query):
+    doc = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            continue
+        if _is_operator_dict(condition):
+            if "$eq" in condition:
+                _set_path(doc, key, copy.deepcopy(condition["$eq"]))
+        else:
+            _set_path(doc, key, copy.deepcopy(condition))
+    return doc
+
+
+# Aggregation expressions
+
+def evaluate(expression, doc):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get_path(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        if _is_operator_dict(expression) and len(expression) == 1:
+            op, args = next(iter(expression.items()))
+            return _evaluate_operator(op, args, doc)
+        # Like MongoDB, a field path that resolves to nothing leaves its key out of the object
+        return {key: evaluate(value, doc) for key, value in expression.items() if not _missing_path(value, doc)}
+    if isinstance(expression, list):
+        return [evaluate(item, doc) for item in expression]
+    return expression
+
+
+def _missing_path(expression, doc):
+    return isinstance(expression, str) and expression.startswith("$") and _get_path(doc, expression[1:]) is _MISSING
+
+
+def _evaluate_operator(op, args, doc):
+    if op == "$cond":
+        if isinstance(args, dict):
+            args = [args["if"], args["then"], args["else"]]
+        condition, then, otherwise = args
+        return evaluate(then, doc) if evaluate(condition, doc) else evaluate(otherwise, doc)
+    if op == "$ifNull":
+        value = evaluate(args[0], doc)
+        return evaluate(args[1], doc) if value is None else value
+    if op == "$eq":
+        left, right = (evaluate(arg, doc) for arg in args)
+        return left == right
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        left, right = (evaluate(arg, doc) for arg in args)
+        return _compare(left, right, op)
+    if op == "$add":
+        return sum(evaluate(arg, doc) or 0 for arg in args)
+    if op == "$substrBytes":
+        value, start, length = (evaluate(arg, doc) for arg in args)
+        return (value or "")[start:start + length]
+    raise NotImplementedError(f"Expression operator {op} is not supported by the memory backend")
+
+
+def _accumulate(op, values):
+    if op == "$sum":
+        return sum(value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool))
+    if op == "$avg":
+        numbers = [value for value in values if isinstance(value, (int, float))]
+        return sum(numbers) / len(numbers) if numbers else None
+    present = [value for value in values if value is not None]
+    if op == "$max":
+        return max(present, key=_sort_key) if present else None
+    if op == "$min":
+        return min(present, key=_sort_key) if present else None
+    if op == "$first":
+        return values[0] if values else None
+    if op == "$last":
+        return values[-1] if values else None
+    if op == "$push":
+        return list(values)
+    raise NotImplementedError(f"Accumulator {op} is not supported by the memory backend")
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        group_id = evaluate(spec["_id"], doc)
+        key = repr(group_id)
+        if key not in groups:
+            groups[key] = (group_id, [])
+        groups[key][1].append(doc)
+
+    results = []
+    for group_id, members in groups.values():
+        row = {"_id": group_id}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            op, expression = next(iter(accumulator.items()))
+            row[field] = _accumulate(op, [evaluate(expression, member) for member in members])
+        results.append(row)
+    return results
+
+
+def _sort_docs(docs, keys):
+    for field, direction in reversed(keys):
+        docs.sort(key=lambda doc: _sort_key(_get_path(doc, field)), reverse=direction < 0)
+    return docs
+
+
+def run_pipeline(docs, pipeline):
+    for stage in pipeline:
+        name, spec = next(iter(stage.items()))
+        if name == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == "$group":
+            docs = _group(docs, spec)
+        elif name == "$sort":
+            docs = _sort_docs(list(docs), list(spec.items()))
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$project":
+            docs = [_project_stage(doc, spec) for doc in docs]
+        elif name == "$facet":
+            docs = [{field: run_pipeline(list(docs), sub) for field, sub in spec.items()}]
+        else:
+            raise NotImplementedError(f"Pipeline stage {name} is not supported by the memory backend")
+    return docs
+
+
+def _project_stage(doc, spec):
+    if all(value in (0, False) for value in spec.values()):
+        return project(doc, spec)
+    result = {"_id": doc.get("_id")} if spec.get("_id", 1) else {}
+    for field, value in spec.items():
+        if field == "_id" and value in (0, 1, True, False):
+            continue
+        if value in (1, True):
+            found = _get_path(doc, field)
+            if found is not _MISSING:
+                result[field] = found
+        else:
+            result[field] = evaluate(value, doc)
+    return result
+
+
+# Cursors
+
+class MemoryCursor:
+    def __init__(self, loader, projection=None, explain_plan=None):
+        self._loader = loader
+        self._projection = projection
+        self._explain_plan = explain_plan
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=1):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, count):
+        return self
+
+    def _results(self):
+        docs = self._loader()
+        if self._sort:
+            docs = _sort_docs(docs, self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length=None):
+        docs = self._results()
+        return docs if length is None else docs[:length]
+
+    async def explain(self):
+        return {"queryPlanner": {"winningPlan": self._explain_plan or {"stage": "COLLSCAN"}}}
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._results():
+            yield doc
+
+
+# Collections
+
+class MemoryCollection:
+    """In-memory collection; equality lookups on any indexed field, the most selective one wins."""
+
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}  # _id -> document, in insertion order
+        self.indexes = {"_id_": {"key": [("_id", 1)], "unique": True}}
+        self.lookups = {}  # indexed field -> {value key: set of _id}
+        self.sequence = {}  # _id -> insertion number, for ordering lookup results
+        self.inserted = 0
+
+    # Index maintenance
+
+    async def create_indexes(self, models):
+        names = []
+        for model in models:
+            document = model.document
+            name = document["name"]
+            self.indexes[name] = {"key": list(document["key"].items()), "unique": document.get("unique", False)}
+            for field, _ in self.indexes[name]["key"]:
+                if field not in self.lookups and field != "_id":
+                    self.lookups[field] = {}
+                    for doc in self.docs.values():
+                        self._index_value(field, doc, add=True)
+            names.append(name)
+        return names
+
+    async def index_information(self):
+        return {name: {"key": info["key"], "unique": info["unique"]} for name, info in self.indexes.items()}
+
+    async def drop_index(self, name):
+        info = self.indexes.pop(name)
+        # Keep a lookup while another index still covers its field
+        for field, _ in info["key"]:
+            if not any(field == other_field for other in self.indexes.values() for other_field, _ in other["key"]):
+                self.lookups.pop(field, None)
+
+    @staticmethod
+    def _lookup_key(value):
+        return repr(value) if isinstance(value, (dict, list)) else (type(value).__name__, value)
+
+    def _index_value(self, field, doc, add):
+        value = _get_path(doc, field)
+        key = self._lookup_key(None if value is _MISSING else value)
+        bucket = self.lookups[field].setdefault(key, set())
+        if add:
+            bucket.add(doc["_id"])
+        else:
+            bucket.discard(doc["_id"])
+
+    def _reindex(self, doc, add):
+        for field in self.lookups:
+            self._index_value(field, doc, add)
+
+    def _check_unique(self, doc, ignore_id=None):
+        for name, info in self.indexes.items():
+            if not info["unique"] or name == "_id_":
+                continue
+            fields = [field for field, _ in info["key"]]
+            values = [_get_path(doc, field) for field in fields]
+            probe = {field: None if value is _MISSING else value for field, value in zip(fields, values)}
+            for other in self._candidates(probe):
+                if other["_id"] == ignore_id:
+                    continue
+                if all(_get_path(other, f) == v for f, v in zip(fields, values)):
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}")
+
+    # Planning
+
+    def _plan(self, query):
+        if isinstance(query.get("_id"), ObjectId):
+            return "_id", query["_id"]
+        best = None
+        for field in self.lookups:
+            condition = query.get(field, _MISSING)
+            if condition is _MISSING or _is_operator_dict(condition) or isinstance(condition, (dict, list)):
+                continue
+            size = len(self.lookups[field].get(self._lookup_key(condition), ()))
+            if best is None or size < best[0]:
+                best = (size, field, condition)
+        return best[1:] if best is not None else None
+
+    def _candidates(self, query):
+        plan = self._plan(query)
+        if plan is None:
+            return list(self.docs.values())
+        field, value = plan
+        if field == "_id":
+            doc = self.docs.get(value)
+            return [doc] if doc is not None else []
+        ids = self.lookups[field].get(self._lookup_key(value), ())
+        # Keep natural (insertion) order, which ObjectId order follows
+        return [self.docs[_id] for _id in sorted(ids, key=self.sequence.__getitem__)]
+
+    def _explain_plan(self, query):
+        plan = self._plan(query)
+        if plan is None:
+            return {"stage": "COLLSCAN"}
+        field = plan[0]
+        index_name = "_id_" if field == "_id" else next(
+            name for name, info in self.indexes.items() if any(key == field for key, _ in info["key"])
+        )
+        return {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": index_name}}
+
+    def _matching(self, query):
+        query = query or {}
+        return [doc for doc in self._candidates(query) if matches(doc, query)]
+
+    # Writes
+
+    def _insert(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_")
+        self._check_unique(doc)
+        self.docs[doc["_id"]] = doc
+        self.sequence[doc["_id"]] = self.inserted
+        self.inserted += 1
+        self._reindex(doc, add=True)
+        return doc
+
+    async def insert_one(self, document):
+        # Like pymongo, the caller's document gains its _id
+        stored = self._insert(document)
+        document["_id"] = stored["_id"]
+        return InsertOneResult(stored["_id"], True)
+
+    async def insert_many(self, documents, ordered=True):
+        ids = []
+        for document in documents:
+            stored = self._insert(document)
+            document["_id"] = stored["_id"]
+            ids.append(stored["_id"])
+        return InsertManyResult(ids, True)
+
+    def _update(self, query, update, upsert=False, multi=False, array_filters=None):
+        targets = self._matching(query)
+        if not multi:
+            targets = targets[:1]
+
+        modified = 0
+        for doc in targets:
+            updated = copy.deepcopy(doc)
+            _apply_update(updated, update, array_filters=array_filters)
+            if updated != doc:
+                self._check_unique(updated, ignore_id=doc["_id"])
+                self._reindex(doc, add=False)
+                doc.clear()
+                doc.update(updated)
+                self._reindex(doc, add=True)
+                modified += 1
+
+        result = {"n": len(targets), "nModified": modified}
+        if not targets and upsert:
+            doc = _upsert_seed(query)
+            _apply_update(doc, update, inserting=True)
+            doc = self._insert(doc)
+            result = {"n": 1, "nModified": 0, "upserted": doc["_id"]}
+        return result, targets
+
+    async def update_one(self, filter, update, upsert=False, array_filters=None):
+        result, _ = self._update(filter, update, upsert=upsert, array_filters=array_filters)
+        return UpdateResult(result, True)
+
+    async def update_many(self, filter, update, upsert=False, array_filters=None):
+        result, _ = self._update(filter, update, upsert=upsert, multi=True, array_filters=array_filters)
+        return UpdateResult(result, True)
+
+    async def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, array_filters=None):
+        targets = self._matching(filter)[:1]
+        before = copy.deepcopy(targets[0]) if targets else None
+        result, _ = self._update(filter, update, upsert=upsert, array_filters=array_filters)
+
+        if return_document == ReturnDocument.AFTER:
+            _id = targets[0]["_id"] if targets else result.get("upserted")
+            after = self.docs.get(_id)
+            return project(after, projection) if after is not None else None
+        return project(before, projection) if before is not None else None
+
+    async def find_one_and_delete(self, filter, projection=None):
+        targets = self._matching(filter)[:1]
+        if not targets:
+            return None
+        doc = targets[0]
+        self._reindex(doc, add=False)
+        del self.docs[doc["_id"]]
+        del self.sequence[doc["_id"]]
+        return project(doc, projection)
+
+    def _delete(self, query, multi):
+        targets = self._matching(query)
+        if not multi:
+            targets = targets[:1]
+        for doc in targets:
+            self._reindex(doc, add=False)
+            del self.docs[doc["_id"]]
+            del self.sequence[doc["_id"]]
+        return {"n": len(targets)}
+
+    async def delete_one(self, filter):
+        return DeleteResult(self._delete(filter, multi=False), True)
+
+    async def delete_many(self, filter):
+        return DeleteResult(self._delete(filter, multi=True), True)
+
+    async def bulk_write(self, requests, ordered=True):
+        summary = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0, "upserted": []}
+        for index, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                self._insert(request._doc)
+                summary["nInserted"] += 1
+            elif isinstance(request, (UpdateOne, UpdateMany)):
+                result, _ = self._update(request._filter, request._doc, upsert=bool(request._upsert),
+                                         multi=isinstance(request, UpdateMany),
+                                         array_filters=request._array_filters)
+                if "upserted" in result:
+                    summary["nUpserted"] += 1
+                    summary["upserted"].append({"index": index, "_id": result["upserted"]})
+                else:
+                    summary["nMatched"] += result["n"]
+                    summary["nModified"] += result["nModified"]
+            elif isinstance(request, (DeleteOne, DeleteMany)):
+                summary["nRemoved"] += self._delete(request._filter, multi=isinstance(request, DeleteMany))["n"]
+            else:
+                raise NotImplementedError(f"{type(request).__name__} is not supported by the memory backend")
+        return BulkWriteResult(summary, True)
+
+    # Reads
+
+    def find(self, filter=None, projection=None):
+        filter = filter or {}
+        return MemoryCursor(lambda: self._matching(filter), projection, self._explain_plan(filter))
+
+    async def find_one(self, filter=None, projection=None):
+        for doc in self._matching(filter):
+            return project(doc, projection)
+        return None
+
+    async def count_documents(self, filter):
+        return len(self._matching(filter))
+
+    async def distinct(self, key, filter=None):
+        values = []
+        seen = set()
+        for doc in self._matching(filter):
+            value = _get_path(doc, key)
+            for item in (value if isinstance(value, list) else [value]):
+                marker = self._lookup_key(item)
+                if item is not _MISSING and marker not in seen:
+                    seen.add(marker)
+                    values.append(item)
+        return values
+
+    def aggregate(self, pipeline):
+        pipeline = list(pipeline)
+        # A leading $match can use the lookup tables like find() does
+        query = pipeline.pop(0)["$match"] if pipeline and "$match" in pipeline[0] else {}
+        return MemoryCursor(lambda: run_pipeline(self._matching(query), pipeline))
+
+
+class MemoryDatabase:
+    def __init__(self, name):
+        self.name = name
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(name)
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self):
+        return [name for name, collection in self.collections.items() if collection.docs]
+
+    async def drop_collection(self, name):
+        self.collections.pop(name, None)
+
+
+class MemoryClient:
+    def __init__(self):
+        self.databases = {}
+
+    def __getitem__(self, name):
+        if name not in self.databases:
+            self.databases[name] = MemoryDatabase(name)
+        return self.databases[name]
+
+    def close(self):
+        pass
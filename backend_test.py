@@ -343,6 +343,17 @@ class StudyFocusAPITester:
             data=stats_data2
         )
         
+        if not success:
+            return False
+        
+        # Achievements are awarded in the background; wait for them
+        success, response = self.run_test(
+            "Flush Side Effects",
+            "POST",
+            "admin/side-effects/flush",
+            200
+        )
+        
         if not success:
             return False
             
@@ -0,0 +1,48 @@
+"""The API on the in-memory storage backend, driven through httpx's ASGI transport.
+
+Every test acts as its own user (X-User-Id), so tests share one process-wide store
+without seeing each other's data.
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+# The app reads its configuration at import time
+os.environ["STORAGE_BACKEND"] = "memory"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def user():
+    return f"test-{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture
+def headers(user):
+    return {"X-User-Id": user}
+
+
+@pytest.fixture
+def api():
+    """Run `scenario(client)` against the app and return its result."""
+    def run(scenario):
+        async def main():
+            # Lifespan events do not run under ASGITransport
+            await server.ensure_indexes()
+            server.side_effects.start()
+            try:
+                transport = httpx.ASGITransport(app=server.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await scenario(client)
+            finally:
+                await server.side_effects.stop()
+        return asyncio.run(main())
+    return run
+
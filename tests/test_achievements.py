@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+import server
+
+
+def days_ago(count):
+    return (date.today() - timedelta(days=count)).isoformat()
+
+
+async def badges(client, headers):
+    achievements = (await client.get("/api/achievements", headers=headers)).json()
+    return sorted(achievement["badge_type"] for achievement in achievements)
+
+
+def test_badges_are_awarded_once_their_metric_reaches_the_threshold(api, headers):
+    async def scenario(client):
+        await client.post("/api/pomodoro/batch", headers=headers, json=[
+            {"duration_minutes": 25, "session_type": "work", "date": days_ago(offset)} for offset in (2, 1, 0)
+        ])
+        await server.side_effects.flush()
+        assert await badges(client, headers) == ["3_day_streak", "first_pomodoro"]
+
+        await client.post("/api/study-stats", headers=headers, json={
+            "subject": "Fizik", "questions_solved": 60, "correct_answers": 50, "time_spent_minutes": 40,
+            "date": days_ago(0)
+        })
+        await server.side_effects.flush()
+        assert await badges(client, headers) == ["3_day_streak", "first_pomodoro"]
+
+        await client.post("/api/study-stats", headers=headers, json={
+            "subject": "Kimya", "questions_solved": 40, "correct_answers": 30, "time_spent_minutes": 30,
+            "date": days_ago(0)
+        })
+        await server.side_effects.flush()
+        assert await badges(client, headers) == ["100_questions", "3_day_streak", "first_pomodoro"]
+
+    api(scenario)
+
+
+def test_new_rules_only_need_a_table_entry(api, headers, monkeypatch):
+    monkeypatch.setattr(server, "ACHIEVEMENT_RULES", server.ACHIEVEMENT_RULES + [
+        {"badge_type": "2_pomodoros", "metric": "work_sessions", "threshold": 2,
+         "title": "2 Pomodoro!", "description": "İki seans!", "icon": "🍅"},
+    ])
+
+    async def scenario(client):
+        for _ in range(2):
+            await client.post("/api/pomodoro", headers=headers, json={
+                "duration_minutes": 25, "session_type": "work", "date": "2026-03-01"
+            })
+            await server.side_effects.flush()
+        assert await badges(client, headers) == ["2_pomodoros", "first_pomodoro"]
+
+    api(scenario)
@@ -0,0 +1,93 @@
+import server
+
+
+def task(title, day, **fields):
+    return {"title": title, "subject": "Matematik", "date": day, **fields}
+
+
+async def create_tasks(client, headers, items):
+    response = await client.post("/api/tasks/batch", json=items, headers=headers)
+    assert response.status_code == 200
+    return [result["id"] for result in response.json()["results"]]
+
+
+def test_bulk_update_by_filter(api, headers):
+    async def scenario(client):
+        items = [task(f"t{i}", "2026-03-01") for i in range(3)] + [task("x", "2026-03-02")]
+        await create_tasks(client, headers, items)
+
+        response = await client.post("/api/tasks/bulk-update", headers=headers, json={
+            "date": "2026-03-01", "changes": {"completed": True, "priority": "high"}
+        })
+        assert response.json() == {"matched": 3, "modified": 3}
+
+        tasks = (await client.get("/api/tasks", headers=headers)).json()
+        assert sorted((t["date"], t["completed"], t["priority"]) for t in tasks) == [
+            ("2026-03-01", True, "high")] * 3 + [("2026-03-02", False, "medium")]
+
+    api(scenario)
+
+
+def test_bulk_update_by_ids_reschedules(api, headers):
+    async def scenario(client):
+        ids = await create_tasks(client, headers, [task(f"t{i}", "2026-03-01") for i in range(4)])
+
+        response = await client.post("/api/tasks/bulk-update", headers=headers, json={
+            "ids": ids[:2], "changes": {"date": "2026-03-05"}
+        })
+        assert response.json()["matched"] == 2
+
+        moved = (await client.get("/api/tasks", params={"date": "2026-03-05"}, headers=headers)).json()
+        assert sorted(t["id"] for t in moved) == sorted(ids[:2])
+
+    api(scenario)
+
+
+def test_bulk_delete_by_filter(api, headers):
+    async def scenario(client):
+        ids = await create_tasks(client, headers, [task(f"t{i}", "2026-03-01") for i in range(3)])
+        await client.put(f"/api/tasks/{ids[0]}", json={"completed": True}, headers=headers)
+
+        response = await client.post("/api/tasks/bulk-delete", json={"completed": True}, headers=headers)
+        assert response.json() == {"matched": 1, "deleted": 1}
+
+        remaining = (await client.get("/api/tasks", headers=headers)).json()
+        assert sorted(t["id"] for t in remaining) == sorted(ids[1:])
+
+    api(scenario)
+
+
+def test_bulk_selection_spans_several_chunks(api, headers, monkeypatch):
+    monkeypatch.setattr(server, "BULK_CHUNK_SIZE", 3)
+
+    async def scenario(client):
+        await create_tasks(client, headers, [task(f"t{i}", "2026-03-0%d" % (1 + i % 2)) for i in range(10)])
+
+        response = await client.post("/api/tasks/bulk-update", headers=headers, json={
+            "subject": "Matematik", "changes": {"completed": True}
+        })
+        assert response.json() == {"matched": 10, "modified": 10}
+
+        response = await client.post("/api/tasks/bulk-delete", json={"completed": True}, headers=headers)
+        assert response.json() == {"matched": 10, "deleted": 10}
+        assert (await client.get("/api/tasks", headers=headers)).json() == []
+
+    api(scenario)
+
+
+def test_bulk_selection_limits(api, headers):
+    async def scenario(client):
+        response = await client.post("/api/tasks/bulk-delete", json={}, headers=headers)
+        assert response.status_code == 400
+
+        response = await client.post("/api/tasks/bulk-delete", headers=headers, json={
+            "ids": [f"id-{i}" for i in range(server.MAX_BATCH_SIZE + 1)]
+        })
+        assert response.status_code == 400
+
+        response = await client.post("/api/tasks/bulk-update", headers=headers, json={
+            "date": "2026-03-01", "changes": {}
+        })
+        assert response.status_code == 400
+
+    api(scenario)
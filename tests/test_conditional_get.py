@@ -0,0 +1,89 @@
+import server
+
+
+async def revalidate(client, path, headers, etag):
+    return await client.get(path, headers={**headers, "If-None-Match": etag})
+
+
+def test_unchanged_data_revalidates_with_304(api, headers):
+    async def scenario(client):
+        first = await client.get("/api/tasks", headers=headers)
+        etag = first.headers["etag"]
+        assert first.headers["vary"] == "X-User-Id"
+
+        response = await revalidate(client, "/api/tasks", headers, etag)
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+    api(scenario)
+
+
+def test_own_write_changes_the_tag(api, headers):
+    async def scenario(client):
+        etag = (await client.get("/api/tasks", headers=headers)).headers["etag"]
+        await client.post("/api/tasks", headers=headers,
+                          json={"title": "a", "subject": "Kimya", "date": "2026-03-01"})
+
+        response = await revalidate(client, "/api/tasks", headers, etag)
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+
+    api(scenario)
+
+
+def test_other_users_write_keeps_the_tag(api, headers):
+    async def scenario(client):
+        etag = (await client.get("/api/tasks", headers=headers)).headers["etag"]
+        await client.post("/api/tasks", headers={"X-User-Id": "someone-else"},
+                          json={"title": "a", "subject": "Kimya", "date": "2026-03-01"})
+
+        assert (await revalidate(client, "/api/tasks", headers, etag)).status_code == 304
+
+    api(scenario)
+
+
+def test_write_from_another_process_changes_the_tag(api, user, headers):
+    async def scenario(client):
+        etag = (await client.get("/api/heatmap", headers=headers)).headers["etag"]
+        # Another worker or a manage command writes and bumps the shared versions directly
+        await server.db.daily_totals.insert_one({"user_id": user, "date": "2026-03-01", "tasks_total": 1})
+        await server.db.data_versions.update_one({"_id": user}, {"$inc": {"daily_totals": 1}}, upsert=True)
+
+        response = await revalidate(client, "/api/heatmap", headers, etag)
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    api(scenario)
+
+
+def test_cached_response_follows_shared_versions(api, user, headers):
+    async def scenario(client):
+        assert (await client.get("/api/profile", headers=headers)).json()["experience"] == 0
+        await server.db.user_profile.update_one({"id": user}, {"$inc": {"experience": 150}})
+        await server.db.data_versions.update_one({"_id": user}, {"$inc": {"user_profile": 1}}, upsert=True)
+
+        profile = (await client.get("/api/profile", headers=headers)).json()
+        assert (profile["experience"], profile["level"]) == (150, 2)
+
+    api(scenario)
+
+
+def test_rebuild_for_all_users_changes_the_tag(api, headers):
+    async def scenario(client):
+        etag = (await client.get("/api/dashboard/stats", headers=headers)).headers["etag"]
+        etag = (await revalidate(client, "/api/dashboard/stats", headers, etag)).headers["etag"]
+        await server.rebuild_daily_totals()
+
+        assert (await revalidate(client, "/api/dashboard/stats", headers, etag)).status_code == 200
+
+    api(scenario)
+
+
+def test_ndjson_is_not_tagged(api, headers):
+    async def scenario(client):
+        response = await client.get("/api/tasks", headers={**headers, "Accept": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert "etag" not in response.headers
+
+    api(scenario)
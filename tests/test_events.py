@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import server
+
+
+def parse_events(body):
+    """(event, data) pairs of an SSE body, leaving out comments and the retry hint."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def open_stream(client, headers, params=None):
+    """Start reading /api/events in the background, returning once the subscription is registered."""
+    user_id = headers.get("X-User-Id", server.DEFAULT_USER_ID)
+    stream = asyncio.create_task(client.get("/api/events", headers=headers, params=params))
+    while not server.event_broker.listening(user_id):
+        await asyncio.sleep(0.01)
+    return stream
+
+
+def test_events_stream_the_writers_changes(api, headers, monkeypatch):
+    monkeypatch.setattr(server, "EVENT_STREAM_MAX_SECONDS", 0.3)
+
+    async def scenario(client):
+        stream = await open_stream(client, headers)
+        await client.post("/api/pomodoro", headers=headers, json={
+            "duration_minutes": 25, "session_type": "work", "date": "2026-03-01"
+        })
+        await server.side_effects.flush()
+
+        response = await stream
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.text)
+        assert events[0] == ("ready", {})
+        assert ("daily_totals", {"date": "2026-03-01", "inc": {"focus_minutes": 25, "work_sessions": 1}}) in events
+        assert ("achievement", "first_pomodoro") in [(name, data.get("badge_type")) for name, data in events]
+        profile = next(data for name, data in events if name == "profile")
+        assert profile["inc"] == {"total_focus_minutes": 25, "experience": 10}
+
+    api(scenario)
+
+
+def test_events_belong_to_the_header_user(api, user, headers, monkeypatch):
+    monkeypatch.setattr(server, "EVENT_STREAM_MAX_SECONDS", 0.3)
+    other = {"X-User-Id": f"{user}-other"}
+
+    async def scenario(client):
+        # ?user= is not a way to listen in on someone else's stream
+        stream = await open_stream(client, other, params={"user": user})
+        await client.post("/api/pomodoro", headers=headers, json={
+            "duration_minutes": 25, "session_type": "work", "date": "2026-03-01"
+        })
+        await server.side_effects.flush()
+
+        assert parse_events((await stream).text) == [("ready", {})]
+
+    api(scenario)
@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+import server
+
+
+def days_ago(count):
+    return (date.today() - timedelta(days=count)).isoformat()
+
+
+def test_heatmap_maps_active_days_to_minutes(api, headers):
+    async def scenario(client):
+        await client.post("/api/pomodoro/batch", headers=headers, json=[
+            {"duration_minutes": 25, "session_type": "work", "date": days_ago(0)},
+            {"duration_minutes": 50, "session_type": "work", "date": days_ago(2)},
+            {"duration_minutes": 5, "session_type": "break", "date": days_ago(1)},
+            {"duration_minutes": 25, "session_type": "work", "date": days_ago(30)},
+        ])
+
+        response = await client.get("/api/heatmap", params={"days": 7}, headers=headers)
+        assert response.json() == {days_ago(0): 25, days_ago(2): 50}
+
+        compact = (await client.get("/api/heatmap", params={"days": 3, "compact": True}, headers=headers)).json()
+        assert compact == {"start": days_ago(3), "minutes": [0, 50, 0, 25]}
+
+    api(scenario)
+
+
+def test_heatmap_days_are_bounded(api, headers):
+    async def scenario(client):
+        for days in (-1, server.MAX_HEATMAP_DAYS + 1, 1000000):
+            response = await client.get("/api/heatmap", params={"days": days, "compact": True}, headers=headers)
+            assert response.status_code == 422, days
+
+        response = await client.get("/api/heatmap", params={"days": server.MAX_HEATMAP_DAYS, "compact": True},
+                                    headers=headers)
+        assert len(response.json()["minutes"]) == server.MAX_HEATMAP_DAYS + 1
+
+    api(scenario)
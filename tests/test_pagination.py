@@ -0,0 +1,54 @@
+import json
+
+
+async def create_tasks(client, headers, count):
+    items = [{"title": f"t{i}", "subject": "Biyoloji", "date": "2026-04-01"} for i in range(count)]
+    response = await client.post("/api/tasks/batch", json=items, headers=headers)
+    return [result["id"] for result in response.json()["results"]]
+
+
+def test_cursor_pages_through_every_task_once(api, headers):
+    async def scenario(client):
+        ids = await create_tasks(client, headers, 5)
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = await client.get("/api/tasks", params=params, headers=headers)
+            page = response.json()
+            assert len(page) <= 2
+            seen += [task["id"] for task in page]
+            cursor = response.headers.get("x-next-cursor")
+            if cursor is None:
+                break
+        assert seen == ids
+
+    api(scenario)
+
+
+def test_invalid_paging_parameters_are_rejected(api, headers):
+    async def scenario(client):
+        for params in ({"cursor": "AAAA"}, {"cursor": "%%%"}, {"cursor": "not-a-cursor"}, {"limit": 0},
+                       {"limit": 100000}):
+            response = await client.get("/api/tasks", params=params, headers=headers)
+            assert response.status_code == 400, params
+
+    api(scenario)
+
+
+def test_ndjson_streams_every_document(api, headers):
+    async def scenario(client):
+        ids = await create_tasks(client, headers, 3)
+        ndjson = {**headers, "Accept": "application/x-ndjson"}
+
+        response = await client.get("/api/tasks", headers=ndjson)
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == ids
+        assert not {"_id", "user_id"} & set(rows[0])
+        assert rows[0]["created_at"].endswith("Z")
+
+        response = await client.get("/api/tasks", params={"limit": 2}, headers=ndjson)
+        assert len(response.text.splitlines()) == 2
+
+    api(scenario)
@@ -0,0 +1,54 @@
+def work_session(day, minutes=25):
+    return {"duration_minutes": minutes, "session_type": "work", "date": day}
+
+
+async def report(client, headers, start, end, granularity="day"):
+    response = await client.get("/api/reports", headers=headers,
+                                params={"from": start, "to": end, "granularity": granularity})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_report_buckets_by_day_week_and_month(api, headers):
+    async def scenario(client):
+        # 2026-01-05 is a Monday
+        sessions = [work_session("2026-01-04"), work_session("2026-01-05"), work_session("2026-01-11", 50),
+                    work_session("2026-02-02")]
+        await client.post("/api/pomodoro/batch", json=sessions, headers=headers)
+
+        daily = await report(client, headers, "2026-01-04", "2026-01-06")
+        assert [(b["start"], b["pomodoros"]) for b in daily["buckets"]] == [
+            ("2026-01-04", 1), ("2026-01-05", 1), ("2026-01-06", 0)]
+
+        weekly = await report(client, headers, "2026-01-01", "2026-01-14", "week")
+        assert [(b["start"], b["end"], b["focus_minutes"]) for b in weekly["buckets"]] == [
+            ("2026-01-01", "2026-01-04", 25), ("2026-01-05", "2026-01-11", 75), ("2026-01-12", "2026-01-14", 0)]
+
+        monthly = await report(client, headers, "2026-01-15", "2026-02-28", "month")
+        assert [(b["start"], b["pomodoros"]) for b in monthly["buckets"]] == [("2026-01-15", 0), ("2026-02-01", 1)]
+        assert monthly["totals"]["pomodoros"] == 1
+
+    api(scenario)
+
+
+def test_report_skips_dates_that_do_not_parse(api, headers):
+    async def scenario(client):
+        await client.post("/api/tasks", headers=headers,
+                          json={"title": "a", "subject": "Tarih", "date": "2026-01-03x"})
+        await client.post("/api/pomodoro", json=work_session("2026-01-03"), headers=headers)
+
+        result = await report(client, headers, "2026-01-01", "2026-01-05")
+        assert result["totals"]["pomodoros"] == 1
+
+    api(scenario)
+
+
+def test_report_rejects_bad_ranges(api, headers):
+    async def scenario(client):
+        for params in ({"from": "2026-01-05", "to": "2026-01-01"}, {"from": "x", "to": "2026-01-01"},
+                       {"from": "2000-01-01", "to": "2026-01-01"},
+                       {"from": "2026-01-01", "to": "2026-01-05", "granularity": "year"}):
+            response = await client.get("/api/reports", params=params, headers=headers)
+            assert response.status_code == 400, params
+
+    api(scenario)
@@ -0,0 +1,186 @@
+import pytest
+
+import server
+from storage import MemoryClient
+
+
+@pytest.fixture
+def legacy_db(monkeypatch):
+    """A fresh database holding documents shaped like the single-user app wrote them, without user_id."""
+    db = MemoryClient()["legacy"]
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+async def seed_legacy(db):
+    await db.tasks.insert_one({
+        "id": "t1", "title": "Eski", "subject": "Fizik", "completed": True, "date": "2026-01-05",
+        "priority": "medium", "duration_minutes": 25, "subtasks": [], "created_at": "2026-01-05T09:00:00"
+    })
+    await db.pomodoro_sessions.insert_one({
+        "id": "p1", "duration_minutes": 25, "session_type": "work", "completed": True, "date": "2026-01-05",
+        "timestamp": "2026-01-05T09:30:00"
+    })
+    await db.study_stats.insert_one({
+        "id": "s1", "subject": "Fizik", "questions_solved": 12, "correct_answers": 9, "time_spent_minutes": 40,
+        "date": "2026-01-05", "timestamp": "2026-01-05T10:00:00"
+    })
+
+
+async def rollup(collection, user_id, key, fields):
+    """The user's rollup counters keyed by `key`, leaving out rows that net to zero."""
+    rows = await server.db[collection].find({"user_id": user_id}).to_list(None)
+    counters = {row[key]: {field: row.get(field, 0) for field in fields} for row in rows}
+    return {name: values for name, values in counters.items() if any(values.values())}
+
+
+async def rollup_counters(user_id):
+    return (
+        await rollup("daily_totals", user_id, "date", server.DAILY_TOTAL_FIELDS),
+        await rollup("subject_totals", user_id, "subject", (*server.SUBJECT_TOTAL_FIELDS, "last_active_date")),
+    )
+
+
+async def assert_rollups_match_rebuild(user_id):
+    maintained = await rollup_counters(user_id)
+    await server.rebuild_daily_totals(user_id)
+    await server.rebuild_subject_totals(user_id)
+    assert maintained == await rollup_counters(user_id)
+
+
+def test_rollups_stay_consistent_after_writes(api, user, headers, monkeypatch):
+    monkeypatch.setattr(server, "BULK_CHUNK_SIZE", 2)
+
+    async def scenario(client):
+        batch = [{"title": f"t{i}", "subject": "Matematik", "date": f"2026-03-0{1 + i % 3}"} for i in range(7)]
+        results = (await client.post("/api/tasks/batch", json=batch, headers=headers)).json()["results"]
+        ids = [result["id"] for result in results]
+        await client.put(f"/api/tasks/{ids[0]}", json={"completed": True, "date": "2026-03-09"}, headers=headers)
+        await client.delete(f"/api/tasks/{ids[1]}", headers=headers)
+        await client.post("/api/tasks/bulk-update", headers=headers, json={
+            "date": "2026-03-02", "changes": {"completed": True}
+        })
+        await client.post("/api/tasks/bulk-update", headers=headers, json={
+            "completed": True, "changes": {"date": "2026-03-04"}
+        })
+        await client.post("/api/tasks/bulk-delete", json={"ids": ids[5:]}, headers=headers)
+
+        await client.post("/api/pomodoro", headers=headers, json={
+            "duration_minutes": 25, "session_type": "work", "date": "2026-03-01"
+        })
+        await client.post("/api/pomodoro/batch", headers=headers, json=[
+            {"duration_minutes": 50, "session_type": "work", "date": "2026-03-02"},
+            {"duration_minutes": 5, "session_type": "break", "date": "2026-03-02"},
+        ])
+        await client.post("/api/study-stats", headers=headers, json={
+            "subject": "Fizik", "questions_solved": 10, "correct_answers": 7, "time_spent_minutes": 30,
+            "date": "2026-03-01"
+        })
+        await client.post("/api/study-stats/batch", headers=headers, json=[
+            {"subject": "Fizik", "questions_solved": 5, "correct_answers": 5, "time_spent_minutes": 10,
+             "date": "2026-03-03"},
+            {"subject": "Kimya", "questions_solved": 8, "correct_answers": 4, "time_spent_minutes": 20,
+             "date": "2026-03-02"},
+        ])
+        await server.side_effects.flush()
+
+        await assert_rollups_match_rebuild(user)
+
+        summary = (await client.get("/api/study-stats/summary", headers=headers)).json()
+        assert [(s["subject"], s["total_questions"], s["total_correct"]) for s in summary] == [
+            ("Fizik", 15, 12), ("Kimya", 8, 4)]
+        report = (await client.get("/api/reports", params={"from": "2026-03-01", "to": "2026-03-09"},
+                                   headers=headers)).json()
+        assert report["totals"] == {
+            "pomodoros": 2, "focus_minutes": 75, "questions": 23, "correct": 16, "accuracy": 69.6,
+            "study_minutes": 60, "tasks_completed": 2, "new_achievements": 0
+        }
+
+    api(scenario)
+
+
+def test_retried_side_effects_apply_once(api, user, headers, monkeypatch):
+    touch = server.touch
+    failures = []
+
+    async def lose_first_replies(user_id, *collections):
+        # The profile write lands, then the step fails as if the reply was lost
+        await touch(user_id, *collections)
+        if "user_profile" in collections and len(failures) < 2:
+            failures.append(collections)
+            raise ConnectionError("reply lost")
+
+    monkeypatch.setattr(server, "touch", lose_first_replies)
+    monkeypatch.setattr(server.side_effects, "retry_delay", 0)
+
+    async def scenario(client):
+        await client.post("/api/pomodoro", headers=headers, json={
+            "duration_minutes": 25, "session_type": "work", "date": "2026-03-01"
+        })
+        await server.side_effects.flush()
+
+        profile = (await client.get("/api/profile", headers=headers)).json()
+        assert len(failures) == 2
+        assert (profile["experience"], profile["total_focus_minutes"]) == (10, 25)
+        assert "applied_sources" not in profile
+
+    api(scenario)
+
+
+def test_startup_backfill_assigns_legacy_documents_to_the_default_user(api, legacy_db):
+    async def scenario(client):
+        await seed_legacy(legacy_db)
+        await server.backfill_empty_rollups()
+
+        rows = await legacy_db.daily_totals.find({}, {"_id": 0}).to_list(None)
+        assert rows == [{
+            "user_id": server.DEFAULT_USER_ID, "date": "2026-01-05", "focus_minutes": 25, "work_sessions": 1,
+            "questions_solved": 12, "correct_answers": 9, "study_minutes": 40, "tasks_total": 1, "tasks_completed": 1
+        }]
+
+    api(scenario)
+
+
+def test_user_id_migration_rebuilds_the_default_users_rollups(api, legacy_db):
+    async def scenario(client):
+        await seed_legacy(legacy_db)
+        # Written by a subject totals rebuild that ran before the migration
+        await legacy_db.subject_totals.insert_one({
+            "subject": "Fizik", "questions_solved": 12, "correct_answers": 9, "time_spent_minutes": 40,
+            "last_active_date": "2026-01-05"
+        })
+
+        migrated = await server.migrate_user_ids()
+        assert migrated["study_stats"] == 1
+        assert await legacy_db.subject_totals.count_documents({"user_id": {"$exists": False}}) == 0
+
+        summary = (await client.get("/api/study-stats/summary")).json()
+        assert [(s["subject"], s["total_questions"], s["total_correct"]) for s in summary] == [("Fizik", 12, 9)]
+        totals = await legacy_db.daily_totals.find_one({"user_id": server.DEFAULT_USER_ID}, {"_id": 0})
+        assert (totals["tasks_total"], totals["work_sessions"]) == (1, 1)
+
+    api(scenario)
+
+
+def test_batched_migrations_rewrite_legacy_fields(api, legacy_db):
+    async def scenario(client):
+        await seed_legacy(legacy_db)
+        await legacy_db.tasks.insert_many([
+            {"id": f"t{index}", "title": "Eski", "subject": "Fizik", "date": "2026-01-06",
+             "subtasks": [{"title": "a"}, {"title": "b", "completed": True}], "created_at": "2026-01-06T09:00:00"}
+            for index in range(2, 5)
+        ])
+
+        # A batch size of one flushes a bulk write per document
+        migrated = await server.migrate_timestamps(batch_size=1)
+        assert migrated == {"tasks": 4, "pomodoro_sessions": 1, "study_stats": 1, "focus_trees": 0, "achievements": 0}
+        assert await legacy_db.tasks.count_documents({"created_at": {"$type": "string"}}) == 0
+        assert await server.migrate_timestamps(batch_size=1) == dict.fromkeys(migrated, 0)
+
+        assert await server.migrate_subtask_ids(batch_size=2) == 3
+        for task in await legacy_db.tasks.find({"id": {"$ne": "t1"}}).to_list(None):
+            assert [(s["title"], s["completed"]) for s in task["subtasks"]] == [("a", False), ("b", True)]
+            assert all(s["id"] for s in task["subtasks"])
+        assert await server.migrate_subtask_ids(batch_size=2) == 0
+
+    api(scenario)
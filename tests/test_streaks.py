@@ -0,0 +1,59 @@
+import argparse
+from datetime import date, timedelta
+
+import manage
+import server
+
+
+def days_ago(count):
+    return (date.today() - timedelta(days=count)).isoformat()
+
+
+async def work_session(client, headers, day, session_type="work"):
+    await client.post("/api/pomodoro", headers=headers, json={
+        "duration_minutes": 25, "session_type": session_type, "date": day
+    })
+    await server.side_effects.flush()
+
+
+async def streak(client, headers):
+    profile = (await client.get("/api/profile", headers=headers)).json()
+    return profile["current_streak"], profile["longest_streak"], profile["last_active_date"]
+
+
+def test_streak_advances_with_each_work_session(api, headers):
+    async def scenario(client):
+        await work_session(client, headers, days_ago(6))
+        await work_session(client, headers, days_ago(5))
+        assert await streak(client, headers) == (2, 2, days_ago(5))
+
+        # A gap starts a new run; breaks and repeated days do not move it
+        await work_session(client, headers, days_ago(2))
+        await work_session(client, headers, days_ago(1), session_type="break")
+        await work_session(client, headers, days_ago(2))
+        assert await streak(client, headers) == (1, 2, days_ago(2))
+
+        await work_session(client, headers, days_ago(1))
+        await work_session(client, headers, days_ago(0))
+        assert await streak(client, headers) == (3, 3, days_ago(0))
+
+        # Backfilling the missing days joins both runs
+        await work_session(client, headers, days_ago(4))
+        await work_session(client, headers, days_ago(3))
+        assert await streak(client, headers) == (7, 7, days_ago(0))
+
+    api(scenario)
+
+
+def test_repair_streaks_rebuilds_profiles_from_history(api, user, headers):
+    async def scenario(client):
+        for offset in (3, 1, 0):
+            await work_session(client, headers, days_ago(offset))
+        await server.db.user_profile.update_one(
+            {"id": user}, {"$set": {"current_streak": 40, "longest_streak": 40, "last_active_date": days_ago(9)}}
+        )
+
+        await manage.repair_streaks(argparse.Namespace(user=user))
+        assert await streak(client, headers) == (2, 2, days_ago(0))
+
+    api(scenario)
@@ -0,0 +1,77 @@
+import asyncio
+
+
+async def create_task(client, headers, subtasks):
+    response = await client.post("/api/tasks", headers=headers, json={
+        "title": "Deneme", "subject": "Fizik", "date": "2026-03-01", "subtasks": subtasks
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+async def subtasks_of(client, headers, task_id):
+    tasks = (await client.get("/api/tasks", headers=headers)).json()
+    return next(t for t in tasks if t["id"] == task_id)["subtasks"]
+
+
+def test_subtasks_get_ids_on_create(api, headers):
+    async def scenario(client):
+        created = await create_task(client, headers, [{"title": "a"}, {"title": "b", "completed": True}])
+        assert [(s["title"], s["completed"]) for s in created["subtasks"]] == [("a", False), ("b", True)]
+        assert all(s["id"] for s in created["subtasks"])
+
+    api(scenario)
+
+
+def test_subtask_routes(api, headers):
+    async def scenario(client):
+        task_id = (await create_task(client, headers, [{"title": "a"}, {"title": "b"}]))["id"]
+
+        added = (await client.post(f"/api/tasks/{task_id}/subtasks", headers=headers,
+                                   json={"title": "first", "position": 0})).json()
+        assert [s["title"] for s in await subtasks_of(client, headers, task_id)] == ["first", "a", "b"]
+
+        response = await client.patch(f"/api/tasks/{task_id}/subtasks/{added['id']}", headers=headers,
+                                      json={"completed": True})
+        assert response.json() == {"id": added["id"], "completed": True}
+
+        response = await client.put(f"/api/tasks/{task_id}/subtasks/{added['id']}/position", headers=headers,
+                                    json={"position": 10})
+        assert response.json() == {"id": added["id"], "position": 2}
+        subtasks = await subtasks_of(client, headers, task_id)
+        assert [(s["title"], s["completed"]) for s in subtasks] == [("a", False), ("b", False), ("first", True)]
+
+        response = await client.delete(f"/api/tasks/{task_id}/subtasks/{added['id']}", headers=headers)
+        assert response.status_code == 200
+        assert [s["title"] for s in await subtasks_of(client, headers, task_id)] == ["a", "b"]
+
+    api(scenario)
+
+
+def test_concurrent_subtask_edits_do_not_overwrite_each_other(api, headers):
+    async def scenario(client):
+        created = await create_task(client, headers, [{"title": str(i)} for i in range(5)])
+        task_id = created["id"]
+
+        await asyncio.gather(*(
+            client.patch(f"/api/tasks/{task_id}/subtasks/{s['id']}", json={"completed": True}, headers=headers)
+            for s in created["subtasks"]
+        ))
+        assert all(s["completed"] for s in await subtasks_of(client, headers, task_id))
+
+    api(scenario)
+
+
+def test_unknown_subtask_or_task(api, headers):
+    async def scenario(client):
+        task_id = (await create_task(client, headers, [{"title": "a"}]))["id"]
+
+        response = await client.patch(f"/api/tasks/{task_id}/subtasks/missing", json={"title": "x"},
+                                      headers=headers)
+        assert response.status_code == 404
+        response = await client.post("/api/tasks/missing/subtasks", json={"title": "x"}, headers=headers)
+        assert response.status_code == 404
+        response = await client.delete(f"/api/tasks/{task_id}/subtasks/missing", headers=headers)
+        assert response.status_code == 404
+
+    api(scenario)
@@ -0,0 +1,56 @@
+import server
+
+
+def new_task(title):
+    return {"title": title, "subject": "Tarih", "date": "2026-03-01"}
+
+
+def test_users_only_see_their_own_documents(api, headers):
+    other = {"X-User-Id": "other-user"}
+
+    async def scenario(client):
+        mine = (await client.post("/api/tasks", json=new_task("mine"), headers=headers)).json()
+        await client.post("/api/tasks", json=new_task("theirs"), headers=other)
+
+        tasks = (await client.get("/api/tasks", headers=headers)).json()
+        assert [t["id"] for t in tasks] == [mine["id"]]
+        assert "user_id" not in tasks[0]
+
+        response = await client.put(f"/api/tasks/{mine['id']}", json={"completed": True}, headers=other)
+        assert response.status_code == 404
+        response = await client.delete(f"/api/tasks/{mine['id']}", headers=other)
+        assert response.status_code == 404
+        response = await client.post("/api/tasks/bulk-delete", json={"ids": [mine["id"]]}, headers=other)
+        assert response.json()["deleted"] == 0
+
+        assert [t["id"] for t in (await client.get("/api/tasks", headers=headers)).json()] == [mine["id"]]
+
+    api(scenario)
+
+
+def test_profiles_and_totals_are_per_user(api, headers):
+    async def scenario(client):
+        await client.post("/api/pomodoro", headers=headers, json={
+            "duration_minutes": 25, "session_type": "work", "date": "2026-03-01"
+        })
+        await server.side_effects.flush()
+
+        stats = (await client.get("/api/pomodoro/stats", headers=headers)).json()
+        assert stats["total_work_minutes"] == 25
+        assert all("user_id" not in session for session in stats["sessions"])
+
+        assert (await client.get("/api/profile", headers=headers)).json()["total_focus_minutes"] == 25
+
+        nobody = {"X-User-Id": "nobody-yet"}
+        assert (await client.get("/api/pomodoro/stats", headers=nobody)).json()["total_sessions"] == 0
+        assert (await client.get("/api/profile", headers=nobody)).json()["total_focus_minutes"] == 0
+
+    api(scenario)
+
+
+def test_invalid_user_header_is_rejected(api):
+    async def scenario(client):
+        response = await client.get("/api/tasks", headers={"X-User-Id": "bad id!"})
+        assert response.status_code == 400
+
+    api(scenario)